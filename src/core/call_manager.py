@@ -3,6 +3,7 @@ Call Manager - Handles voice call logic
 """
 
 import os
+import time
 import asyncio
 import logging
 from typing import Dict, Any, Optional, List
@@ -15,6 +16,11 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Call session states
+PENDING = 0
+ACTIVE = 1
+ENDED = 2
+
 class CallManager:
     """
     Manages voice calls with AI processing
@@ -38,7 +44,7 @@ class CallManager:
             'auto_answer': os.getenv('AUTO_ANSWER_CALLS', 'true').lower() == 'true',
             'record_calls': os.getenv('RECORD_CALLS', 'true').lower() == 'true',
             'max_duration': int(os.getenv('MAX_CALL_DURATION', '300')),
-            'answer_delay': 2
+            'auto_answer_delay': float(os.getenv('AUTO_ANSWER_DELAY', '2.0'))
         }
         
         # Register handlers
@@ -74,9 +80,18 @@ class CallManager:
         self.active_calls[call_id] = session
         
         if self.config['auto_answer']:
-            await asyncio.sleep(self.config['answer_delay'])
-            await self.tdlib.accept_call(call_id)
-            logger.info(f"✅ Auto-answered call {call_id}")
+            # Timer lives on the session so a hangup cancels it
+            session.tasks.append(
+                asyncio.create_task(self._delayed_accept(session))
+            )
+    
+    async def _delayed_accept(self, session: 'CallSession'):
+        """Accept a call once the auto-answer delay has passed"""
+        await asyncio.sleep(self.config['auto_answer_delay'])
+        if session.state != PENDING or session.call_id not in self.active_calls:
+            return
+        await self.tdlib.accept_call(session.call_id)
+        logger.info(f"✅ Auto-answered call {session.call_id}")
     
     async def on_call_ready(self, call: Dict[str, Any]):
         """Handle call when connected"""
@@ -86,7 +101,7 @@ class CallManager:
             self.active_calls[call_id] = CallSession(call_id, call.get('user_id'))
         
         session = self.active_calls[call_id]
-        session.state = 'active'
+        transition(session, ACTIVE, time.monotonic_ns())
         session.connected_time = datetime.utcnow()
         
         logger.info(f"🎙️ Call {call_id} is active")
@@ -107,7 +122,7 @@ class CallManager:
             return
         
         try:
-            while session.state == 'active':
+            while session.state == ACTIVE:
                 # Check max duration
                 if session.connected_time:
                     duration = (datetime.utcnow() - session.connected_time).total_seconds()
@@ -142,7 +157,7 @@ class CallManager:
         
         if call_id in self.active_calls:
             session = self.active_calls[call_id]
-            session.state = 'ended'
+            transition(session, ENDED, time.monotonic_ns())
             session.end_time = datetime.utcnow()
             
             # Cancel tasks
@@ -162,13 +177,23 @@ class CallManager:
 class CallSession:
     """Represents an active call session"""
     
+    __slots__ = ('call_id', 'user_id', 'state', 'start_time_ns', 'state_changed_ns',
+                 'connected_time', 'end_time', 'conversation_history', 'audio_buffer', 'tasks')
+    
     def __init__(self, call_id: int, user_id: Optional[int] = None):
         self.call_id = call_id
         self.user_id = user_id
-        self.state = 'pending'
-        self.start_time = datetime.utcnow()
+        self.state = PENDING
+        self.start_time_ns = time.monotonic_ns()
+        self.state_changed_ns = self.start_time_ns
         self.connected_time: Optional[datetime] = None
         self.end_time: Optional[datetime] = None
         self.conversation_history: List[Dict] = []
         self.audio_buffer = deque(maxlen=200)
-        self.tasks: List[asyncio.Task] = []
\ No newline at end of file
+        self.tasks: List[asyncio.Task] = []
+
+
+def transition(session: CallSession, new_state: int, now_ns: int):
+    """Move a session to new_state, recording when it happened"""
+    session.state = new_state
+    session.state_changed_ns = now_ns
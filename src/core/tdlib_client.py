@@ -3,12 +3,14 @@ TDLib Client - Fixed for proper parameter passing
 """
 
 import os
+import re
 import asyncio
-import json
+import orjson
 import logging
-from typing import Dict, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Set
 from pathlib import Path
 import ctypes
+import threading
 from ctypes import CDLL, c_void_p, c_char_p, c_double
 from datetime import datetime
 from dotenv import load_dotenv
@@ -19,6 +21,38 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# acceptCall encoded once; only the call id is formatted in per call
+_ACCEPT_CALL = orjson.dumps({
+    '@type': 'acceptCall',
+    'call_id': '__CALL_ID__',
+    'protocol': {
+        '@type': 'callProtocol',
+        'udp_p2p': True,
+        'udp_reflector': True,
+        'min_layer': 65,
+        'max_layer': 92
+    }
+}).replace(b'"__CALL_ID__"', b'%d')
+
+# Sent on shutdown; encoded up front so teardown does no serialization
+_CLOSE = orjson.dumps({'@type': 'close'})
+
+_EMPTY_ENCRYPTION_KEY = orjson.dumps({
+    '@type': 'checkDatabaseEncryptionKey',
+    'encryption_key': ''
+})
+
+# TDLib writes "@type" first in every object, so the update type can be read
+# without decoding the rest of the payload
+_TYPE_RE = re.compile(rb'\{"@type":"(\w+)"')
+
+# Call states that are passed on to a registered handler, by handler name
+_CALL_STATE_EVENTS = {
+    'callStatePending': 'on_incoming_call',
+    'callStateReady': 'on_call_ready',
+    'callStateDiscarded': 'on_call_ended'
+}
+
 class TDLibClient:
     """TDLib client for Telegram integration"""
     
@@ -42,8 +76,63 @@ class TDLibClient:
         self.call_handlers = {}
         self.active_calls = {}
         self._running = False
+        self._updates: Optional[asyncio.Queue] = None
+        self._reader_thread: Optional[threading.Thread] = None
+        self._receive_task: Optional[asyncio.Task] = None
+        # Call handlers in flight; kept referenced until they finish
+        self._tasks: Set[asyncio.Task] = set()
+        self._code_requested = False
+        
+        # Update dispatch keyed by TDLib @type; anything else is ignored
+        self._update_handlers = {
+            'updateAuthorizationState': self._on_authorization_state,
+            'updateCall': self._on_call,
+            'error': self._on_error
+        }
+        self._handled_types = frozenset(t.encode() for t in self._update_handlers)
+        self._auth_handlers = {
+            'authorizationStateWaitTdlibParameters': self._auth_wait_parameters,
+            'authorizationStateWaitEncryptionKey': self._auth_wait_encryption_key,
+            'authorizationStateWaitPhoneNumber': self._auth_wait_phone_number,
+            'authorizationStateWaitCode': self._auth_wait_code,
+            'authorizationStateWaitPassword': self._auth_wait_password,
+            'authorizationStateReady': self._auth_ready
+        }
         self.auth_handler = AuthHandler()
         
+        # TDLib parameters - THIS IS THE CRITICAL PART; encoded once
+        tdlib_params = {
+            '@type': 'setTdlibParameters',
+            'parameters': {
+                'use_test_dc': False,
+                'database_directory': './data/tdlib/db',
+                'files_directory': './data/tdlib/files',
+                'use_file_database': True,
+                'use_chat_info_database': True,
+                'use_message_database': True,
+                'use_secret_chats': False,
+                'api_id': self.api_id,  # MUST be an integer
+                'api_hash': self.api_hash,  # MUST be a string
+                'system_language_code': 'en',
+                'device_model': 'Desktop',
+                'system_version': 'Unknown',
+                'application_version': '1.0.0',
+                'enable_storage_optimizer': True
+            }
+        }
+        self._params_payload = orjson.dumps(tdlib_params)
+        self._phone_payload = orjson.dumps({
+            '@type': 'setAuthenticationPhoneNumber',
+            'phone_number': self.phone_number,
+            'settings': {
+                '@type': 'phoneNumberAuthenticationSettings',
+                'allow_flash_call': False,
+                'allow_missed_call': False,
+                'is_current_phone_number': False,
+                'allow_sms_retriever_api': False
+            }
+        })
+        
         # Create data directories
         Path('./data/tdlib/db').mkdir(parents=True, exist_ok=True)
         Path('./data/tdlib/files').mkdir(parents=True, exist_ok=True)
@@ -108,118 +197,130 @@ class TDLibClient:
         self.client = self.tdjson.td_json_client_create()
         self._running = True
         
-        # Start update receiver
-        asyncio.create_task(self._receive_updates())
+        # Start update receiver; TDLib blocks on a worker thread and the
+        # loop only wakes when an update has actually arrived
+        self._updates = asyncio.Queue()
+        self._reader_thread = threading.Thread(
+            target=self._reader,
+            args=(asyncio.get_running_loop(),),
+            daemon=True
+        )
+        self._reader_thread.start()
+        self._receive_task = asyncio.create_task(self._receive_updates())
         
         # Wait a moment
         await asyncio.sleep(0.5)
         
-        # Set TDLib parameters - THIS IS THE CRITICAL PART
-        tdlib_params = {
-            '@type': 'setTdlibParameters',
-            'parameters': {
-                'use_test_dc': False,
-                'database_directory': './data/tdlib/db',
-                'files_directory': './data/tdlib/files',
-                'use_file_database': True,
-                'use_chat_info_database': True,
-                'use_message_database': True,
-                'use_secret_chats': False,
-                'api_id': self.api_id,  # MUST be an integer
-                'api_hash': self.api_hash,  # MUST be a string
-                'system_language_code': 'en',
-                'device_model': 'Desktop',
-                'system_version': 'Unknown',
-                'application_version': '1.0.0',
-                'enable_storage_optimizer': True
-            }
-        }
-        
         logger.info(f"Sending parameters with api_id: {self.api_id}")
-        await self._send(tdlib_params)
+        await self._send_raw(self._params_payload)
         
         # Wait for parameter confirmation
         await asyncio.sleep(1)
         
         logger.info("TDLib client initialized")
     
+    def _reader(self, loop: asyncio.AbstractEventLoop):
+        """Block in TDLib on a worker thread and hand updates to the loop"""
+        receive = self.tdjson.td_json_client_receive
+        block_timeout = c_double(10.0)
+        poll_timeout = c_double(0.0)
+        while self._running:
+            # Park on one blocking receive, then drain whatever else is
+            # already queued without blocking and wake the loop once
+            batch = []
+            result = receive(self.client, block_timeout)
+            while result:
+                batch.append(result)
+                result = receive(self.client, poll_timeout)
+            if batch:
+                loop.call_soon_threadsafe(self._deliver, batch)
+    
+    def _deliver(self, batch: List[bytes]):
+        """Queue a batch of raw updates on the loop thread"""
+        for result in batch:
+            self._updates.put_nowait(result)
+    
     async def _receive_updates(self):
         """Receive updates from Telegram"""
-        request_code = False
-        
         while self._running:
-            if self.client:
-                try:
-                    result = self.tdjson.td_json_client_receive(
-                        self.client, c_double(1.0)
-                    )
-                    if result:
-                        update = json.loads(result.decode('utf-8'))
-                        
-                        # Handle different update types
-                        update_type = update.get('@type')
-                        
-                        if update_type == 'updateAuthorizationState':
-                            auth_state = update['authorization_state']['@type']
-                            logger.info(f"Auth state: {auth_state}")
-                            
-                            if auth_state == 'authorizationStateWaitTdlibParameters':
-                                # Should not reach here if parameters were sent correctly
-                                logger.error("TDLib still waiting for parameters!")
-                                
-                            elif auth_state == 'authorizationStateWaitEncryptionKey':
-                                # Send empty encryption key
-                                await self._send({
-                                    '@type': 'checkDatabaseEncryptionKey',
-                                    'encryption_key': ''
-                                })
-                                
-                            elif auth_state == 'authorizationStateWaitPhoneNumber':
-                                # Send phone number
-                                logger.info(f"Sending phone number: {self.phone_number[:3]}***")
-                                await self._send({
-                                    '@type': 'setAuthenticationPhoneNumber',
-                                    'phone_number': self.phone_number,
-                                    'settings': {
-                                        '@type': 'phoneNumberAuthenticationSettings',
-                                        'allow_flash_call': False,
-                                        'allow_missed_call': False,
-                                        'is_current_phone_number': False,
-                                        'allow_sms_retriever_api': False
-                                    }
-                                })
-                                
-                            elif auth_state == 'authorizationStateWaitCode' and not request_code:
-                                request_code = True
-                                # Get code from user
-                                code = input("\n📲 Enter verification code: ")
-                                await self._send({
-                                    '@type': 'checkAuthenticationCode',
-                                    'code': code
-                                })
-                                
-                            elif auth_state == 'authorizationStateWaitPassword':
-                                # Get 2FA password
-                                password = input("\n🔐 Enter 2FA password: ")
-                                await self._send({
-                                    '@type': 'checkAuthenticationPassword',
-                                    'password': password
-                                })
-                                
-                            elif auth_state == 'authorizationStateReady':
-                                self.authorized = True
-                                logger.info("✅ Successfully logged in!")
-                                
-                        elif update_type == 'updateCall':
-                            await self._handle_call_update(update['call'])
-                            
-                        elif update_type == 'error':
-                            logger.error(f"TDLib error: {update.get('message')}")
-                            
-                except Exception as e:
-                    logger.error(f"Error receiving update: {e}")
-                    
-            await asyncio.sleep(0.01)
+            result = await self._updates.get()
+            # Skip decoding updates nobody handles
+            match = _TYPE_RE.match(result)
+            if match and match[1] not in self._handled_types:
+                continue
+            try:
+                update = orjson.loads(result)
+                handler = self._update_handlers.get(update.get('@type'))
+                if handler:
+                    await handler(update)
+            except Exception as e:
+                logger.error(f"Error receiving update: {e}")
+    
+    async def _on_authorization_state(self, update: Dict):
+        """Answer authorization state changes"""
+        auth_state = update['authorization_state']['@type']
+        logger.info(f"Auth state: {auth_state}")
+        
+        handler = self._auth_handlers.get(auth_state)
+        if handler:
+            await handler()
+    
+    async def _auth_wait_parameters(self):
+        """Report parameters that TDLib did not accept"""
+        # Should not reach here if parameters were sent correctly
+        logger.error("TDLib still waiting for parameters!")
+    
+    async def _auth_wait_encryption_key(self):
+        """Send empty encryption key"""
+        await self._send_raw(_EMPTY_ENCRYPTION_KEY)
+    
+    async def _auth_wait_phone_number(self):
+        """Send phone number"""
+        logger.info(f"Sending phone number: {self.phone_number[:3]}***")
+        await self._send_raw(self._phone_payload)
+    
+    async def _auth_wait_code(self):
+        """Get verification code from user"""
+        if self._code_requested:
+            return
+        self._code_requested = True
+        code = await self.auth_handler.request_verification_code()
+        await self._send({
+            '@type': 'checkAuthenticationCode',
+            'code': code
+        })
+    
+    async def _auth_wait_password(self):
+        """Get 2FA password from user"""
+        password = await self.auth_handler.request_2fa_password()
+        await self._send({
+            '@type': 'checkAuthenticationPassword',
+            'password': password
+        })
+    
+    async def _auth_ready(self):
+        """Mark the client as logged in"""
+        self.authorized = True
+        logger.info("✅ Successfully logged in!")
+    
+    async def _on_call(self, update: Dict):
+        """Handle a call update without holding up other updates"""
+        task = asyncio.get_running_loop().create_task(
+            self._dispatch_call_update(update['call'])
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _on_error(self, update: Dict):
+        """Log TDLib errors"""
+        logger.error(f"TDLib error: {update.get('message')}")
+    
+    async def _dispatch_call_update(self, call: Dict):
+        """Handle a call update without letting a failure stop the receiver"""
+        try:
+            await self._handle_call_update(call)
+        except Exception as e:
+            logger.error(f"Error handling call {call.get('id')}: {e}")
     
     async def _handle_call_update(self, call: Dict):
         """Handle call updates"""
@@ -228,21 +329,25 @@ class TDLibClient:
         
         logger.info(f"📞 Call {call_id} - State: {state}")
         
-        if state == 'callStatePending' and not call.get('is_outgoing'):
+        event = _CALL_STATE_EVENTS.get(state)
+        if event is None:
+            return
+        if event == 'on_incoming_call':
+            if call.get('is_outgoing'):
+                return
             logger.info(f"📲 Incoming call {call_id}")
-            if 'on_incoming_call' in self.call_handlers:
-                await self.call_handlers['on_incoming_call'](call)
-        elif state == 'callStateReady':
-            if 'on_call_ready' in self.call_handlers:
-                await self.call_handlers['on_call_ready'](call)
-        elif state == 'callStateDiscarded':
-            if 'on_call_ended' in self.call_handlers:
-                await self.call_handlers['on_call_ended'](call)
+        
+        handler = self.call_handlers.get(event)
+        if handler:
+            await handler(call)
     
     async def _send(self, query: Dict[str, Any]):
         """Send query to TDLib"""
-        query_str = json.dumps(query).encode('utf-8')
-        self.tdjson.td_json_client_send(self.client, query_str)
+        self.tdjson.td_json_client_send(self.client, orjson.dumps(query))
+    
+    async def _send_raw(self, payload: bytes):
+        """Send a pre-encoded query to TDLib"""
+        self.tdjson.td_json_client_send(self.client, payload)
     
     def register_handler(self, event: str, handler: Callable):
         """Register event handler"""
@@ -250,23 +355,23 @@ class TDLibClient:
     
     async def accept_call(self, call_id: int):
         """Accept incoming call"""
-        await self._send({
-            '@type': 'acceptCall',
-            'call_id': call_id,
-            'protocol': {
-                '@type': 'callProtocol',
-                'udp_p2p': True,
-                'udp_reflector': True,
-                'min_layer': 65,
-                'max_layer': 92
-            }
-        })
+        await self._send_raw(_ACCEPT_CALL % call_id)
     
     async def close(self):
         """Close TDLib client"""
         self._running = False
-        self.auth_handler = AuthHandler()
+        if self._receive_task is not None:
+            self._receive_task.cancel()
+        for task in self._tasks:
+            task.cancel()
         if self.client:
-            await self._send({'@type': 'close'})
-            await asyncio.sleep(1)
+            await self._send_raw(_CLOSE)
+            # The receiver wakes on the closing updates; destroy only after it exits
+            if self._reader_thread is not None:
+                await asyncio.to_thread(self._reader_thread.join, 15)
+                # Still inside td_json_client_receive; freeing the client
+                # under it would be a use-after-free
+                if self._reader_thread.is_alive():
+                    logger.warning("TDLib receiver did not stop; leaving the client undestroyed")
+                    return
             self.tdjson.td_json_client_destroy(self.client)
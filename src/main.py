@@ -9,6 +9,11 @@ import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Load environment variables first
 load_dotenv()
 
@@ -212,6 +217,9 @@ async def main():
 if __name__ == "__main__":
     # Run the assistant
     try:
+        # Policy hook rather than asyncio.Runner, which needs Python 3.11
+        if uvloop:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         asyncio.run(main())
     except KeyboardInterrupt:
         print("\n👋 Goodbye!")
@@ -2,13 +2,48 @@
 Logging configuration for the assistant
 """
 
+import atexit
 import logging
+import os
+import queue
 import sys
+from collections.abc import Mapping
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-def setup_logging(log_level="INFO", log_file="logs/assistant.log"):
-    """Setup logging configuration"""
+# Arguments of these types can't change after the call, so formatting them
+# later on the listener thread gives the same text
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+# Listener started by the first setup_logging() call
+_listener = None
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread"""
+    
+    def prepare(self, record):
+        # The stock prepare() always formats on the calling thread; only do
+        # that when the message or an argument is mutable (dicts, call
+        # sessions), so the line shows its state at logging time and the
+        # object stays on this thread
+        # A lone dict argument becomes record.args itself, and is mutable
+        args = record.args or ()
+        if (not isinstance(record.msg, str) or isinstance(args, Mapping)
+                or not all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+def setup_logging(log_level=None, log_file="logs/assistant.log"):
+    """Setup logging configuration; later calls reuse the first setup"""
+    global _listener
+    
+    root_logger = logging.getLogger()
+    if _listener is not None:
+        return root_logger
+    
+    # Level defaults to LOG_LEVEL from the environment
+    log_level = log_level or os.getenv('LOG_LEVEL', 'INFO')
     
     # Create logs directory
     Path("logs").mkdir(exist_ok=True)
@@ -33,11 +68,18 @@ def setup_logging(log_level="INFO", log_file="logs/assistant.log"):
     file_handler.setFormatter(formatter)
     file_handler.setLevel(log_level)
     
-    # Root logger
-    root_logger = logging.getLogger()
+    # Root logger only enqueues records; formatting and I/O happen on the
+    # listener thread (see _DeferredQueueHandler) so the event loop never
+    # blocks on stdout or disk
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(_listener.stop)
+    
     root_logger.setLevel(log_level)
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    root_logger.addHandler(_DeferredQueueHandler(log_queue))
     
     # Suppress noisy libraries
     logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -4,10 +4,11 @@ Super Smart AI Assistant with Advanced Capabilities
 For intern-mayaagent | 2025-11-05 15:54:45 UTC
 """
 
+import io
 import time
+import asyncio
+import hashlib
 import speech_recognition as sr
-from gtts import gTTS
-import pygame
 import os
 import json
 import random
@@ -15,14 +16,193 @@ import re
 import requests
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import wikipedia
-import wolframalpha
+from functools import cached_property
+from importlib.util import find_spec
 import threading
 import queue
 from collections import deque
+from itertools import islice
+import diskcache
+import orjson
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 load_dotenv()
 
+# Fixed phrases synthesized ahead of time while the user is talking
+COMMON_PROMPTS = [
+    "Hello! I'm your super intelligent assistant. I can remember our conversations, learn about you, and provide smart responses. What's your name?",
+    "Hello! I'm your super smart assistant. What's your name?",
+    "Feel free to ask me anything - I'm learning and improving!",
+    "Tell me about yourself! I'd love to learn.",
+]
+
+# Context history speaker codes
+CTX_USER = 0
+CTX_AI = 1
+
+# Response-branch keywords: (keyword, tag, priority, template). Branches are
+# tried in priority order; each handler may decline by returning None.
+BRANCH_KEYWORDS = [
+    ("my name is", "name_is", 1, None),
+    ("my name", "name_ask", 2, None),
+    ("hello", "greet", 3, None),
+    ("hi", "greet", 3, None),
+    ("who is", "wiki", 4, None),
+    ("what is", "wiki", 4, None),
+    ("tell me about", "wiki", 4, None),
+    ("+", "math", 5, None),
+    ("-", "math", 5, None),
+    ("*", "math", 5, None),
+    ("/", "math", 5, None),
+    ("plus", "math", 5, None),
+    ("minus", "math", 5, None),
+    ("times", "math", 5, None),
+    ("divided", "math", 5, None),
+    ("weather", "weather", 6, None),
+    ("news", "news", 7, None),
+    ("remember", "remember", 8, None),
+    ("what do you remember", "recall", 9, None),
+    ("what do you know about me", "recall", 9, None),
+    ("joke", "joke", 10, None),
+    ("i like", "like", 11, None),
+    ("i love", "like", 11, None),
+]
+BRANCH_ORDER = [tag for _, tag in sorted({(priority, tag) for _, tag, priority, _ in BRANCH_KEYWORDS})]
+
+# Smart-fallback keywords: (keyword, tag, priority, response template).
+# Lower priority wins when several keywords appear in the same input.
+KEYWORD_RESPONSES = [
+    ("help", "kw_help", 10,
+     "I can help with math, facts, jokes, weather, remember things about you, and have intelligent conversations! You've asked me {interactions} questions so far."),
+    ("capabilities", "kw_capabilities", 20,
+     "I can: remember conversations, learn about you, tell jokes, do complex math, search Wikipedia, provide emotional support, and much more!"),
+    ("smart", "kw_smart", 30,
+     "I use multiple AI systems, remember our conversations, learn from what you tell me, and adapt to your preferences!"),
+    ("how are you", "kw_how_are_you", 40,
+     "I'm functioning optimally! I've learned {facts} facts and had {interactions} interactions with you."),
+    ("favorite", "kw_favorite", 50,
+     "Your interests include: {interests}"),
+]
+
+
+class RegexAutomaton:
+    """Fallback with the ahocorasick.Automaton interface used below"""
+
+    def __init__(self):
+        self.values = {}
+        self.pattern = None
+
+    def add_word(self, key, value):
+        self.values[key] = value
+
+    def make_automaton(self):
+        # One optional lookahead group per key length, so every key that
+        # matches at a position is reported, not just the longest
+        by_len = {}
+        for key in self.values:
+            by_len.setdefault(len(key), []).append(re.escape(key))
+        groups = "".join(f"(?:(?=({'|'.join(by_len[n])}))|)"
+                         for n in sorted(by_len, reverse=True))
+        any_key = "|".join(alt for n in by_len for alt in by_len[n])
+        self.pattern = re.compile(f"(?=(?:{any_key})){groups}")
+
+    def iter(self, text):
+        found = []
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            for key in match.groups():
+                if key is not None:
+                    found.append((start + len(key) - 1, key))
+        # Report by end offset, as pyahocorasick does
+        found.sort(key=lambda hit: hit[0])
+        for end, key in found:
+            yield end, self.values[key]
+
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+# Emotion vocabularies, checked in this order by detect_emotion()
+_HAPPY_WORDS = frozenset({"happy", "great", "awesome", "wonderful", "excited", "love", "amazing"})
+_SAD_WORDS = frozenset({"sad", "depressed", "down", "unhappy", "crying", "terrible"})
+_ANGRY_WORDS = frozenset({"angry", "mad", "frustrated", "annoyed", "hate", "furious"})
+
+
+def scan_substrings(text, kw_chars, kw_starts, kw_lens, hits):
+    """Store in hits the offset where each keyword first ends in text (-1 if absent)"""
+    for k in range(kw_starts.shape[0]):
+        start = kw_starts[k]
+        length = kw_lens[k]
+        hits[k] = -1
+        for i in range(text.shape[0] - length + 1):
+            j = 0
+            while j < length and text[i + j] == kw_chars[start + j]:
+                j += 1
+            if j == length:
+                hits[k] = i + length - 1
+                break
+
+
+class NumbaAutomaton:
+    """Numba-compiled substring matcher used when pyahocorasick is missing"""
+
+    def __init__(self):
+        self.values = {}
+
+    def add_word(self, key, value):
+        self.values[key] = value
+
+    def make_automaton(self):
+        import numpy as np
+        from numba import njit
+
+        self.np = np
+        self.keys = list(self.values)
+        # Code points, so match offsets line up with str indices
+        self.kw_chars = np.frombuffer("".join(self.keys).encode("utf-32-le"), dtype=np.uint32)
+        self.kw_lens = np.array([len(key) for key in self.keys], dtype=np.int32)
+        self.kw_starts = np.zeros(len(self.keys), dtype=np.int32)
+        self.kw_starts[1:] = np.cumsum(self.kw_lens)[:-1]
+        self.scan = njit(cache=True)(scan_substrings)
+
+    def iter(self, text):
+        np = self.np
+        chars = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        hits = np.empty(len(self.keys), dtype=np.int32)
+        self.scan(chars, self.kw_chars, self.kw_starts, self.kw_lens, hits)
+        for end, k in sorted((end, k) for k, end in enumerate(hits) if end >= 0):
+            yield int(end), self.values[self.keys[k]]
+
+
+def lower_with_offsets(text):
+    """Lowercase text for keyword scans, with a map back to text indices
+
+    str.lower() can lengthen a string ('İ' becomes two code points), which
+    would shift offsets found in the lowered copy. The map is None when every
+    character stayed in place.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered, None
+    return lowered, [i for i, ch in enumerate(text) for _ in ch.lower()]
+
+
+def build_keyword_automaton(entries):
+    """Compile keyword entries into a single-pass matcher"""
+    if ahocorasick:
+        automaton = ahocorasick.Automaton()
+    elif find_spec("numba"):
+        automaton = NumbaAutomaton()
+    else:
+        automaton = RegexAutomaton()
+    for keyword, tag, priority, template in entries:
+        automaton.add_word(keyword, (tag, priority, template))
+    automaton.make_automaton()
+    return automaton
+
 class SuperSmartAssistant:
     def __init__(self):
         print("\n" + "="*70)
@@ -33,18 +213,39 @@ class SuperSmartAssistant:
         print("="*70)
         
         # Core components
+        import pygame
         pygame.mixer.init()
         self.recognizer = sr.Recognizer()
         self.mic = sr.Microphone()
         
+        # Persistent cache shared across restarts (TTS audio, lookups, memory)
+        self.cache = diskcache.FanoutCache('.cache', shards=4)
+        
         # Advanced features
         self.memory = self.load_memory()
-        self.context_history = deque(maxlen=10)  # Remember last 10 exchanges
+        # Remember last 10 exchanges as parallel speaker/text columns
+        self._ctx_types = deque(maxlen=10)
+        self._ctx_texts = deque(maxlen=10)
         self.user_profile = self.load_user_profile()
+        self._dirty = False
         self.learning_data = []
         
         # Knowledge bases
         self.knowledge_base = self.load_knowledge_base()
+        self.keyword_automaton = build_keyword_automaton(BRANCH_KEYWORDS + KEYWORD_RESPONSES)
+        self.dispatch = {
+            "name_is": self._handle_name_is,
+            "name_ask": self._handle_name_ask,
+            "greet": self._handle_greet,
+            "wiki": self._handle_wiki,
+            "math": self._handle_math,
+            "weather": self._handle_weather,
+            "news": self._handle_news,
+            "remember": self._handle_remember,
+            "recall": self._handle_recall,
+            "joke": self._handle_joke,
+            "like": self._handle_like,
+        }
         
         # API clients (optional)
         self.setup_apis()
@@ -61,11 +262,12 @@ class SuperSmartAssistant:
     
     def setup_apis(self):
         """Setup optional API connections for enhanced intelligence"""
+        # Heavy client libraries are only imported when actually usable
         # OpenAI
         try:
-            from openai import OpenAI
             api_key = os.getenv('OPENAI_API_KEY')
-            if api_key and api_key != "sk-your-key-here":
+            if api_key and api_key != "sk-your-key-here" and find_spec("openai"):
+                from openai import OpenAI
                 self.openai = OpenAI(api_key=api_key)
                 self.has_openai = True
                 print("✅ OpenAI GPT connected")
@@ -77,7 +279,8 @@ class SuperSmartAssistant:
         # Wolfram Alpha (for complex calculations)
         try:
             app_id = os.getenv('WOLFRAM_APP_ID')
-            if app_id:
+            if app_id and find_spec("wolframalpha"):
+                import wolframalpha
                 self.wolfram = wolframalpha.Client(app_id)
                 self.has_wolfram = True
                 print("✅ Wolfram Alpha connected")
@@ -86,16 +289,23 @@ class SuperSmartAssistant:
         except:
             self.has_wolfram = False
         
-        # Wikipedia
-        try:
-            wikipedia.set_lang("en")
-            self.has_wikipedia = True
+        # Wikipedia (imported on first lookup)
+        self.has_wikipedia = find_spec("wikipedia") is not None
+        if self.has_wikipedia:
             print("✅ Wikipedia connected")
-        except:
-            self.has_wikipedia = False
+    
+    @cached_property
+    def _wiki(self):
+        """Wikipedia module, imported on first use"""
+        import wikipedia
+        wikipedia.set_lang("en")
+        return wikipedia
     
     def load_memory(self):
-        """Load persistent memory from file"""
+        """Load persistent memory from cache (or legacy file)"""
+        memory = self.cache.get('memory')
+        if memory is not None:
+            return orjson.loads(memory)
         try:
             with open('assistant_memory.json', 'r') as f:
                 return json.load(f)
@@ -110,9 +320,8 @@ class SuperSmartAssistant:
             }
     
     def save_memory(self):
-        """Save memory to file"""
-        with open('assistant_memory.json', 'w') as f:
-            json.dump(self.memory, f, indent=2)
+        """Save memory to cache"""
+        self.cache['memory'] = orjson.dumps(self.memory)
     
     def load_user_profile(self):
         """Load or create user profile"""
@@ -162,30 +371,20 @@ class SuperSmartAssistant:
             }
         }
     
-    def listen(self):
+    async def listen(self):
         """Enhanced listening with context awareness"""
+        loop = asyncio.get_running_loop()
         try:
-            with self.mic as source:
-                print("\n👂 Listening intelligently...")
-                audio = self.recognizer.listen(source, timeout=8, phrase_time_limit=7)
+            print("\n👂 Listening intelligently...")
+            audio = await loop.run_in_executor(None, self._capture)
             
             print("🧠 Processing with advanced recognition...")
-            
-            # Try multiple recognition methods
-            text = None
-            try:
-                text = self.recognizer.recognize_google(audio)
-            except:
-                try:
-                    # Fallback to different language
-                    text = self.recognizer.recognize_google(audio, language="en-IN")
-                except:
-                    pass
+            text = await loop.run_in_executor(None, self._recognize, audio)
             
             if text:
                 print(f"📝 Understood: '{text}'")
                 # Add to context
-                self.context_history.append({"type": "user", "text": text, "time": datetime.now()})
+                self.add_context(CTX_USER, text)
                 # Analyze emotion
                 emotion = self.detect_emotion(text)
                 if emotion:
@@ -200,49 +399,78 @@ class SuperSmartAssistant:
             print(f"❌ Error: {e}")
             return None
     
+    def _capture(self):
+        """Record one phrase from the microphone (blocking)"""
+        with self.mic as source:
+            return self.recognizer.listen(source, timeout=8, phrase_time_limit=7)
+    
+    def _recognize(self, audio):
+        """Transcribe audio, trying multiple recognition methods (blocking)"""
+        try:
+            return self.recognizer.recognize_google(audio)
+        except:
+            try:
+                # Fallback to different language
+                return self.recognizer.recognize_google(audio, language="en-IN")
+            except:
+                return None
+    
+    def add_context(self, speaker, text):
+        """Append an exchange to the context history"""
+        self._ctx_types.append(speaker)
+        self._ctx_texts.append(text)
+    
     def detect_emotion(self, text):
         """Detect emotion in text"""
-        text_lower = text.lower()
-        
-        happy_words = ["happy", "great", "awesome", "wonderful", "excited", "love", "amazing"]
-        sad_words = ["sad", "depressed", "down", "unhappy", "crying", "terrible"]
-        angry_words = ["angry", "mad", "frustrated", "annoyed", "hate", "furious"]
-        
-        for word in happy_words:
-            if word in text_lower:
-                return "happy"
-        for word in sad_words:
-            if word in text_lower:
-                return "sad"
-        for word in angry_words:
-            if word in text_lower:
-                return "angry"
+        words = set(_WORD_RE.findall(text.lower()))
+        
+        if words & _HAPPY_WORDS:
+            return "happy"
+        if words & _SAD_WORDS:
+            return "sad"
+        if words & _ANGRY_WORDS:
+            return "angry"
         
         return None
     
-    def speak(self, text, emotion=None):
+    async def speak(self, text, emotion=None):
         """Speak with emotion awareness"""
         print(f"🤖 AI: '{text}'")
         
         # Add to context
-        self.context_history.append({"type": "ai", "text": text, "time": datetime.now()})
+        self.add_context(CTX_AI, text)
         
         # Adjust speech based on emotion
         slow = emotion == "sad"
         
-        tts = gTTS(text=text, lang='en', slow=slow)
-        temp_file = f"temp_audio_{int(time.time())}.mp3"
-        tts.save(temp_file)
-        
-        pygame.mixer.music.load(temp_file)
-        pygame.mixer.music.set_volume(0.8)
-        pygame.mixer.music.play()
-        
-        while pygame.mixer.music.get_busy():
-            time.sleep(0.1)
-        
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+        await asyncio.get_running_loop().run_in_executor(None, self._play, text, slow)
+    
+    def _play(self, text, slow):
+        """Synthesize and play text until finished (blocking)"""
+        import pygame
+        
+        # Play from memory - no temp file round trip
+        buf = io.BytesIO(self.synthesize(text, slow))
+        sound = pygame.mixer.Sound(file=buf)
+        sound.set_volume(0.8)
+        # Force a channel; Sound.play() returns None when all are busy
+        channel = pygame.mixer.find_channel(True)
+        channel.play(sound)
+        
+        while channel.get_busy():
+            pygame.time.wait(10)
+    
+    def synthesize(self, text, slow=False):
+        """Return MP3 bytes for text, reusing previously synthesized audio"""
+        key = f"tts:{hashlib.sha1(f'{slow}:{text}'.encode()).hexdigest()}"
+        mp3 = self.cache.get(key)
+        if mp3 is None:
+            from gtts import gTTS
+            buf = io.BytesIO()
+            gTTS(text=text, lang='en', slow=slow).write_to_fp(buf)
+            mp3 = buf.getvalue()
+            self.cache[key] = mp3
+        return mp3
     
     def get_super_smart_response(self, user_input):
         """Generate highly intelligent responses"""
@@ -250,110 +478,34 @@ class SuperSmartAssistant:
         if not user_input:
             return None
         
-        user_lower = user_input.lower()
+        user_lower, lower_index = lower_with_offsets(user_input)
         
         # Update interaction count
         self.user_profile["interaction_count"] += 1
         self.user_profile["last_interaction"] = datetime.now()
         
-        # 1. CHECK PERSONAL MEMORY
-        if "my name is" in user_lower:
-            name = user_input.split("my name is")[-1].strip().split()[0]
-            self.memory["user_name"] = name
-            self.save_memory()
-            return f"Wonderful to meet you, {name}! I'll remember that. What interests you most?"
-        
-        if self.memory["user_name"] and "my name" in user_lower:
-            return f"Of course I remember, {self.memory['user_name']}! We've talked {self.user_profile['interaction_count']} times now."
-        
-        # 2. TIME-AWARE RESPONSES
-        current_hour = datetime.now().hour
-        if "hello" in user_lower or "hi" in user_lower:
-            if self.memory["user_name"]:
-                name = self.memory["user_name"]
-                if current_hour < 12:
-                    return f"Good morning, {name}! Ready for a productive day?"
-                elif current_hour < 17:
-                    return f"Good afternoon, {name}! How's your day progressing?"
-                else:
-                    return f"Good evening, {name}! How was your day?"
-            else:
-                return "Hello! I'm your super smart assistant. What's your name?"
-        
-        # 3. WIKIPEDIA SEARCH
-        if "who is" in user_lower or "what is" in user_lower or "tell me about" in user_lower:
-            query = user_input.replace("who is", "").replace("what is", "").replace("tell me about", "").strip()
-            if self.has_wikipedia:
-                try:
-                    summary = wikipedia.summary(query, sentences=2)
-                    return f"According to Wikipedia: {summary}"
-                except:
-                    pass
-        
-        # 4. ADVANCED MATH (Wolfram Alpha or local)
-        if any(op in user_input for op in ["+", "-", "*", "/", "plus", "minus", "times", "divided"]):
-            if self.has_wolfram:
-                try:
-                    res = self.wolfram.query(user_input)
-                    answer = next(res.results).text
-                    return f"The answer is {answer}"
-                except:
-                    pass
-            # Fallback to local calculation
-            return self.calculate_advanced(user_input)
-        
-        # 5. WEATHER (using free API)
-        if "weather" in user_lower:
-            return self.get_weather_response()
-        
-        # 6. NEWS (mock or real API)
-        if "news" in user_lower:
-            return self.get_news_response()
-        
-        # 7. REMEMBER CONVERSATIONS
-        if "remember" in user_lower:
-            fact = user_input.replace("remember", "").replace("that", "").strip()
-            self.memory["facts_learned"].append(fact)
-            self.save_memory()
-            return f"I'll remember that: {fact}. I now know {len(self.memory['facts_learned'])} things you've told me!"
-        
-        if "what do you remember" in user_lower or "what do you know about me" in user_lower:
-            if self.memory["facts_learned"]:
-                facts = "\n".join(f"• {fact}" for fact in self.memory["facts_learned"][-3:])
-                return f"I remember:\n{facts}\nAnd {len(self.memory['facts_learned'])-3} more things!"
-            return "Tell me about yourself! I'd love to learn."
-        
-        # 8. JOKES WITH CATEGORIES
-        if "joke" in user_lower:
-            if "programming" in user_lower or "coding" in user_lower:
-                jokes = [
-                    "Why do programmers prefer dark mode? Because light attracts bugs!",
-                    "Why do Python programmers prefer snake_case? Because they can't C sharp!",
-                    "A SQL query walks into a bar, sees two tables and asks: Can I join you?"
-                ]
-            else:
-                jokes = [
-                    "Why don't scientists trust atoms? Because they make up everything!",
-                    "What do you call a bear with no teeth? A gummy bear!",
-                    "Why did the scarecrow win an award? He was outstanding in his field!"
-                ]
-            return random.choice(jokes)
-        
-        # 9. LEARNING FROM USER
-        if "i like" in user_lower or "i love" in user_lower:
-            interest = user_input.split("like")[-1].split("love")[-1].strip()
-            if interest not in self.user_profile["interests"]:
-                self.user_profile["interests"].append(interest)
-                self.save_user_profile()
-            return f"Great! I'll remember you like {interest}. Want to know a fun fact about it?"
+        # One pass over the input: tag -> (end offset, priority, template),
+        # with offsets into user_input so handlers can slice it
+        hits = {}
+        for end, (tag, priority, template) in self.keyword_automaton.iter(user_lower):
+            if lower_index is not None:
+                end = lower_index[end]
+            hits.setdefault(tag, (end, priority, template))
+        
+        # 1-9. KEYWORD BRANCHES
+        for tag in BRANCH_ORDER:
+            if tag in hits:
+                response = self.dispatch[tag](user_input, user_lower, hits[tag][0])
+                if response is not None:
+                    return response
         
         # 10. CONTEXTUAL RESPONSES
-        if len(self.context_history) > 2:
+        if len(self._ctx_types) > 2:
             # Check previous context
             last_ai = None
-            for item in reversed(self.context_history):
-                if item["type"] == "ai":
-                    last_ai = item["text"]
+            for i in range(len(self._ctx_types) - 1, -1, -1):
+                if self._ctx_types[i] == CTX_AI:
+                    last_ai = self._ctx_texts[i]
                     break
             
             if last_ai and "fun fact" in last_ai.lower():
@@ -377,9 +529,11 @@ class SuperSmartAssistant:
                 ]
                 
                 # Add context from history
-                for item in list(self.context_history)[-4:]:
-                    role = "user" if item["type"] == "user" else "assistant"
-                    messages.append({"role": role, "content": item["text"]})
+                start = max(len(self._ctx_types) - 4, 0)
+                for speaker, text in zip(islice(self._ctx_types, start, None),
+                                         islice(self._ctx_texts, start, None)):
+                    role = "user" if speaker == CTX_USER else "assistant"
+                    messages.append({"role": role, "content": text})
                 
                 messages.append({"role": "user", "content": user_input})
                 
@@ -395,21 +549,128 @@ class SuperSmartAssistant:
         
         # 13. SMART FALLBACK
         # Analyze input for keywords and provide relevant response
-        keywords_responses = {
-            "help": f"I can help with math, facts, jokes, weather, remember things about you, and have intelligent conversations! You've asked me {self.user_profile['interaction_count']} questions so far.",
-            "capabilities": "I can: remember conversations, learn about you, tell jokes, do complex math, search Wikipedia, provide emotional support, and much more!",
-            "smart": "I use multiple AI systems, remember our conversations, learn from what you tell me, and adapt to your preferences!",
-            "how are you": f"I'm functioning optimally! I've learned {len(self.memory['facts_learned'])} facts and had {self.user_profile['interaction_count']} interactions with you.",
-            "favorite": f"Your interests include: {', '.join(self.user_profile['interests'][:3]) if self.user_profile['interests'] else 'Tell me what you like!'}"
-        }
-        
-        for keyword, response in keywords_responses.items():
-            if keyword in user_lower:
-                return response
+        kw_hits = [hit for tag, hit in hits.items() if tag.startswith("kw_")]
+        if kw_hits:
+            _, _, template = min(kw_hits, key=lambda hit: hit[1])
+            interests = self.user_profile["interests"]
+            return template.format(
+                interactions=self.user_profile["interaction_count"],
+                facts=len(self.memory["facts_learned"]),
+                interests=", ".join(interests[:3]) if interests else "Tell me what you like!"
+            )
         
         # Final intelligent fallback
         return f"That's an interesting point about '{user_input}'. Based on our {self.user_profile['interaction_count']} conversations, I think you'd be interested to know more. What aspect intrigues you most?"
     
+    # Keyword branch handlers: (user_input, user_lower, end offset of the
+    # matched keyword in user_input) -> response, or None to fall through.
+    
+    def _handle_name_is(self, user_input, user_lower, end):
+        """1. CHECK PERSONAL MEMORY"""
+        words = user_input[end + 1:].split()
+        if not words:
+            return None
+        name = words[0]
+        self.memory["user_name"] = name
+        self._dirty = True
+        return f"Wonderful to meet you, {name}! I'll remember that. What interests you most?"
+    
+    def _handle_name_ask(self, user_input, user_lower, end):
+        if self.memory["user_name"]:
+            return f"Of course I remember, {self.memory['user_name']}! We've talked {self.user_profile['interaction_count']} times now."
+        return None
+    
+    def _handle_greet(self, user_input, user_lower, end):
+        """2. TIME-AWARE RESPONSES"""
+        if not self.memory["user_name"]:
+            return "Hello! I'm your super smart assistant. What's your name?"
+        name = self.memory["user_name"]
+        current_hour = datetime.now().hour
+        if current_hour < 12:
+            return f"Good morning, {name}! Ready for a productive day?"
+        elif current_hour < 17:
+            return f"Good afternoon, {name}! How's your day progressing?"
+        else:
+            return f"Good evening, {name}! How was your day?"
+    
+    def _handle_wiki(self, user_input, user_lower, end):
+        """3. WIKIPEDIA SEARCH"""
+        if not self.has_wikipedia:
+            return None
+        query = user_input[end + 1:].strip()
+        try:
+            summary = self.cache.get(f"wiki:{query}")
+            if summary is None:
+                summary = self._wiki.summary(query, sentences=2)
+                self.cache[f"wiki:{query}"] = summary
+            return f"According to Wikipedia: {summary}"
+        except:
+            return None
+    
+    def _handle_math(self, user_input, user_lower, end):
+        """4. ADVANCED MATH (Wolfram Alpha or local)"""
+        if self.has_wolfram:
+            try:
+                answer = self.cache.get(f"wolfram:{user_input}")
+                if answer is None:
+                    res = self.wolfram.query(user_input)
+                    answer = next(res.results).text
+                    self.cache[f"wolfram:{user_input}"] = answer
+                return f"The answer is {answer}"
+            except:
+                pass
+        # Fallback to local calculation
+        return self.calculate_advanced(user_input)
+    
+    def _handle_weather(self, user_input, user_lower, end):
+        """5. WEATHER (using free API)"""
+        return self.get_weather_response()
+    
+    def _handle_news(self, user_input, user_lower, end):
+        """6. NEWS (mock or real API)"""
+        return self.get_news_response()
+    
+    def _handle_remember(self, user_input, user_lower, end):
+        """7. REMEMBER CONVERSATIONS"""
+        fact = user_input[end + 1:].strip()
+        if fact.lower().startswith("that "):
+            fact = fact[5:].strip()
+        if not fact:
+            return None
+        self.memory["facts_learned"].append(fact)
+        self._dirty = True
+        return f"I'll remember that: {fact}. I now know {len(self.memory['facts_learned'])} things you've told me!"
+    
+    def _handle_recall(self, user_input, user_lower, end):
+        if self.memory["facts_learned"]:
+            facts = "\n".join(f"• {fact}" for fact in self.memory["facts_learned"][-3:])
+            return f"I remember:\n{facts}\nAnd {len(self.memory['facts_learned'])-3} more things!"
+        return "Tell me about yourself! I'd love to learn."
+    
+    def _handle_joke(self, user_input, user_lower, end):
+        """8. JOKES WITH CATEGORIES"""
+        if "programming" in user_lower or "coding" in user_lower:
+            jokes = [
+                "Why do programmers prefer dark mode? Because light attracts bugs!",
+                "Why do Python programmers prefer snake_case? Because they can't C sharp!",
+                "A SQL query walks into a bar, sees two tables and asks: Can I join you?"
+            ]
+        else:
+            jokes = [
+                "Why don't scientists trust atoms? Because they make up everything!",
+                "What do you call a bear with no teeth? A gummy bear!",
+                "Why did the scarecrow win an award? He was outstanding in his field!"
+            ]
+        return random.choice(jokes)
+    
+    def _handle_like(self, user_input, user_lower, end):
+        """9. LEARNING FROM USER"""
+        interest = user_input[end + 1:].strip()
+        if interest not in self.user_profile["interests"]:
+            self.user_profile["interests"].append(interest)
+            self._dirty = True
+        return f"Great! I'll remember you like {interest}. Want to know a fun fact about it?"
+    
     def calculate_advanced(self, expression):
         """Advanced calculator with word problems"""
         try:
@@ -487,6 +748,29 @@ SAY THINGS LIKE:
         
         input("\n▶️ Press ENTER when ready...")
         
+        asyncio.run(self._run())
+    
+    async def _save_if_dirty(self):
+        """Persist memory and profile if a response changed them"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.save_memory)
+        await loop.run_in_executor(None, self.save_user_profile)
+    
+    async def _prefetch(self):
+        """Synthesize COMMON_PROMPTS into the TTS cache"""
+        loop = asyncio.get_running_loop()
+        for prompt in COMMON_PROMPTS:
+            try:
+                await loop.run_in_executor(None, self.synthesize, prompt)
+            except Exception as e:
+                print(f"⚠️ TTS prefetch failed: {e}")
+                return
+    
+    async def _run(self):
+        """Async conversation loop; disk and TTS work runs off the loop"""
         # Personalized greeting based on history
         if self.memory["user_name"]:
             greeting = f"Welcome back, {self.memory['user_name']}! "
@@ -498,13 +782,15 @@ SAY THINGS LIKE:
         else:
             greeting = "Hello! I'm your super intelligent assistant. I can remember our conversations, learn about you, and provide smart responses. What's your name?"
         
-        self.speak(greeting)
+        # Greeting first, so the prefetch never synthesizes it concurrently
+        await self.speak(greeting)
+        await self._prefetch()
         
         silence_count = 0
         
         while True:
             try:
-                user_input = self.listen()
+                user_input = await self.listen()
                 
                 if not user_input:
                     silence_count += 1
@@ -514,7 +800,7 @@ SAY THINGS LIKE:
                             "Feel free to ask me anything - I'm learning and improving!",
                             f"Did you know we've had {self.user_profile['interaction_count']} interactions? Let's make this one count!"
                         ]
-                        self.speak(random.choice(prompts))
+                        await self.speak(random.choice(prompts))
                         silence_count = 0
                     continue
                 
@@ -529,17 +815,20 @@ SAY THINGS LIKE:
                     farewell = f"Goodbye{' ' + self.memory['user_name'] if self.memory['user_name'] else ''}! "
                     farewell += f"I've learned {len(self.memory['facts_learned'])} things from you. "
                     farewell += "Can't wait for our next conversation!"
-                    self.speak(farewell)
+                    await self.speak(farewell)
                     break
                 
                 # Get super intelligent response
                 response = self.get_super_smart_response(user_input)
                 if response:
+                    # Persist what this turn learned before playback, which
+                    # the user can interrupt
+                    await self._save_if_dirty()
                     # Detect emotion for appropriate delivery
                     emotion = self.detect_emotion(user_input)
-                    self.speak(response, emotion)
+                    await self.speak(response, emotion)
                 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, asyncio.CancelledError):
                 break
         
         print(f"\n📊 Session Stats:")
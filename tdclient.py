@@ -0,0 +1,237 @@
+"""
+Shared TDLib JSON client for the voice assistant scripts
+
+Fully type-annotated so it can be compiled with mypyc as-is.
+"""
+
+import asyncio
+import getpass
+import re
+import threading
+from typing import Any, ClassVar, Dict, FrozenSet, Iterable, List, Optional
+
+import orjson
+
+from tdjson_cffi import load_tdjson
+from tdlib_path import find_tdlib
+
+# TDLib writes "@type" first in every object, so the update type can be read
+# without decoding the rest of the payload
+_TYPE_RE = re.compile(rb'\{"@type":"(\w+)"')
+
+# Constant requests encoded once at import; templates only have their
+# placeholders spliced per use
+_CLOSE = orjson.dumps({'@type': 'close'})
+
+_PARAMS_TEMPLATE = orjson.dumps({
+    '@type': 'setTdlibParameters',
+    'api_id': '__API_ID__',
+    'api_hash': '__API_HASH__',
+    'database_directory': './data/tdlib/db',
+    'files_directory': './data/tdlib/files',
+    'use_file_database': True,
+    'use_chat_info_database': True,
+    'use_message_database': True,
+    'use_secret_chats': False,
+    'system_language_code': 'en',
+    'device_model': 'Desktop',
+    'system_version': 'Unknown',
+    'application_version': '1.0.0',
+    'enable_storage_optimizer': True
+})
+
+_PHONE_TEMPLATE = orjson.dumps({
+    '@type': 'setAuthenticationPhoneNumber',
+    'phone_number': '__PHONE__',
+    'settings': {
+        '@type': 'phoneNumberAuthenticationSettings',
+        'allow_flash_call': False,
+        'allow_missed_call': False,
+        'is_current_phone_number': False,
+        'allow_sms_retriever_api': False,
+        'authentication_tokens': []
+    }
+})
+
+class TDClient:
+    """TDLib JSON client that feeds updates into an asyncio queue"""
+
+    # One TDLib client per process; anyone may execute(), but only one
+    # owner start()s it and consumes the update queue
+    _shared: ClassVar[Optional['TDClient']] = None
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path: str = path or find_tdlib()
+        self.tdlib: Any = load_tdjson(self.path)
+        self.client: Any = None
+        self.running: bool = False
+        self.updates: Optional[asyncio.Queue] = None
+        self._reader_thread: Optional[threading.Thread] = None
+        self._skip_types: FrozenSet[bytes] = frozenset()
+
+    @classmethod
+    def shared(cls) -> 'TDClient':
+        """Return the process-wide client, loading TDLib on first use"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def execute(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Run a synchronous TDLib request, bypassing the update queue"""
+        result = self.tdlib.execute(None, orjson.dumps(data))
+        if result:
+            return orjson.loads(result)
+        return None
+
+    def send(self, data: Dict[str, Any]) -> None:
+        """Send request to TDLib"""
+        self.tdlib.send(self.client, orjson.dumps(data))
+
+    def send_raw(self, payload: bytes) -> None:
+        """Send a pre-serialized request to TDLib"""
+        self.tdlib.send(self.client, payload)
+
+    def skip_updates(self, types: Iterable[str]) -> None:
+        """Deliver these update types as bare {'@type': ...} stubs, undecoded"""
+        self._skip_types = frozenset(t.encode() for t in types)
+
+    def receive(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Receive response from TDLib"""
+        result = self.tdlib.receive(self.client, timeout)
+        if result:
+            match = _TYPE_RE.match(result)
+            if match and match[1] in self._skip_types:
+                return {'@type': match[1].decode()}
+            return orjson.loads(result)
+        return None
+
+    def _reader(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Block in TDLib on a worker thread and hand updates to the loop"""
+        while self.running:
+            # Park on one blocking receive, then drain whatever else is
+            # already queued without blocking and wake the loop once
+            batch: List[Dict[str, Any]] = []
+            update = self.receive(10.0)
+            while update:
+                batch.append(update)
+                update = self.receive(0.0)
+            if batch:
+                loop.call_soon_threadsafe(self._deliver, batch)
+
+    def _deliver(self, batch: List[Dict[str, Any]]) -> None:
+        """Queue a batch of updates on the loop thread"""
+        assert self.updates is not None
+        for update in batch:
+            self.updates.put_nowait(update)
+
+    def start(self) -> None:
+        """Create the TDLib client and start the receiver thread"""
+        # Every update goes to a single queue, so a second consumer would
+        # silently steal updates (auth states are never resent)
+        if self._reader_thread is not None and self._reader_thread.is_alive():
+            raise RuntimeError("TDClient is already started by another owner")
+        if self.client is None:
+            self.client = self.tdlib.create()
+        self.running = True
+        self.updates = asyncio.Queue()
+        self._reader_thread = threading.Thread(
+            target=self._reader,
+            args=(asyncio.get_running_loop(),),
+            daemon=True
+        )
+        self._reader_thread.start()
+
+    async def get_update(self) -> Dict[str, Any]:
+        """Wait for the next TDLib update"""
+        assert self.updates is not None
+        return await self.updates.get()
+
+    async def authenticate(self, api_id: int, api_hash: str, phone: str) -> None:
+        """Drive the authorization states until TDLib reports ready"""
+        params_payload = (_PARAMS_TEMPLATE
+                          .replace(b'"__API_ID__"', b'%d' % api_id)
+                          .replace(b'"__API_HASH__"', orjson.dumps(api_hash)))
+        phone_payload = _PHONE_TEMPLATE.replace(b'"__PHONE__"', orjson.dumps(phone))
+        code_requested = False
+        
+        while True:
+            update = await self.get_update()
+            
+            update_type = update.get('@type', '')
+            
+            if update_type == 'updateAuthorizationState':
+                state = update['authorization_state']['@type']
+                
+                if state == 'authorizationStateWaitTdlibParameters':
+                    self.send_raw(params_payload)
+                    print("📤 Sent TDLib parameters")
+                
+                elif state == 'authorizationStateWaitPhoneNumber':
+                    self.send_raw(phone_payload)
+                    print(f"📱 Sent phone number: {phone[:6]}****")
+                
+                elif state == 'authorizationStateWaitCode' and not code_requested:
+                    print("\n" + "="*60)
+                    print("📲 VERIFICATION CODE REQUIRED")
+                    print("Check your Telegram app")
+                    print("="*60)
+                    # Prompt on a worker thread so updates keep flowing
+                    code = (await asyncio.to_thread(input, "Enter code: ")).strip()
+                    
+                    self.send({
+                        '@type': 'checkAuthenticationCode',
+                        'code': code
+                    })
+                    code_requested = True
+                
+                elif state == 'authorizationStateWaitPassword':
+                    password = await asyncio.to_thread(
+                        getpass.getpass, "🔐 Enter 2FA password: "
+                    )
+                    
+                    self.send({
+                        '@type': 'checkAuthenticationPassword',
+                        'password': password
+                    })
+                
+                elif state == 'authorizationStateReady':
+                    return
+            
+            elif update_type == 'error':
+                print(f"⚠️ Error: {update.get('message')}")
+
+    def _release(self) -> bool:
+        """Stop the receiver; True when the caller must finish shutting down"""
+        if self.client is None:
+            return False
+        self.running = False
+        # The receiver wakes on the closing updates; destroy only after it exits
+        self.send_raw(_CLOSE)
+        return True
+
+    def _destroy(self) -> None:
+        """Free the TDLib client once the receiver has exited"""
+        # A receiver still inside TDLib after the join would use freed memory
+        if self._reader_thread is not None and self._reader_thread.is_alive():
+            print("⚠️ TDLib receiver did not stop; leaving the client undestroyed")
+            return
+        self.tdlib.destroy(self.client)
+        self.client = None
+        if TDClient._shared is self:
+            TDClient._shared = None
+
+    def close(self, timeout: float = 15.0) -> None:
+        """Close the TDLib client and stop the receiver, blocking until done"""
+        if not self._release():
+            return
+        if self._reader_thread is not None:
+            self._reader_thread.join(timeout)
+        self._destroy()
+
+    async def aclose(self, timeout: float = 15.0) -> None:
+        """Close the TDLib client without blocking the event loop"""
+        if not self._release():
+            return
+        if self._reader_thread is not None:
+            await asyncio.to_thread(self._reader_thread.join, timeout)
+        self._destroy()
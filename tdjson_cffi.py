@@ -0,0 +1,73 @@
+"""
+TDLib JSON client bindings via cffi, with a ctypes fallback
+"""
+
+from ctypes import CDLL, c_void_p, c_char_p, c_double
+
+try:
+    from cffi import FFI
+except ImportError:
+    FFI = None
+
+_CDEF = """
+void *td_json_client_create();
+void td_json_client_send(void *client, const char *request);
+const char *td_json_client_receive(void *client, double timeout);
+const char *td_json_client_execute(void *client, const char *request);
+void td_json_client_destroy(void *client);
+"""
+
+class CffiTDJson:
+    """libtdjson loaded in cffi ABI mode"""
+
+    def __init__(self, path):
+        ffi = FFI()
+        ffi.cdef(_CDEF)
+        lib = ffi.dlopen(path)
+        self._lib = lib
+        self._string = ffi.string
+        self._null = ffi.NULL
+        self._receive = lib.td_json_client_receive
+        self._execute = lib.td_json_client_execute
+        self.create = lib.td_json_client_create
+        self.send = lib.td_json_client_send
+        self.destroy = lib.td_json_client_destroy
+
+    def receive(self, client, timeout):
+        """Return the next update as bytes, or None on timeout"""
+        result = self._receive(client, timeout)
+        if result:
+            return self._string(result)
+        return None
+
+    def execute(self, client, request):
+        """Run a synchronous request and return its result as bytes"""
+        result = self._execute(client or self._null, request)
+        if result:
+            return self._string(result)
+        return None
+
+class CtypesTDJson:
+    """libtdjson loaded through ctypes"""
+
+    def __init__(self, path):
+        lib = CDLL(path)
+        lib.td_json_client_create.restype = c_void_p
+        lib.td_json_client_send.argtypes = [c_void_p, c_char_p]
+        lib.td_json_client_receive.restype = c_char_p
+        lib.td_json_client_receive.argtypes = [c_void_p, c_double]
+        lib.td_json_client_execute.restype = c_char_p
+        lib.td_json_client_execute.argtypes = [c_void_p, c_char_p]
+        lib.td_json_client_destroy.argtypes = [c_void_p]
+        self._lib = lib
+        self.create = lib.td_json_client_create
+        self.send = lib.td_json_client_send
+        self.receive = lib.td_json_client_receive
+        self.execute = lib.td_json_client_execute
+        self.destroy = lib.td_json_client_destroy
+
+def load_tdjson(path):
+    """Load libtdjson, preferring cffi when it is installed"""
+    if FFI is not None:
+        return CffiTDJson(path)
+    return CtypesTDJson(path)
@@ -0,0 +1,14 @@
+"""
+Lightweight test doubles
+"""
+
+class AsyncStub:
+    """Awaitable callable that records its calls"""
+    
+    def __init__(self, return_value=None):
+        self.return_value = return_value
+        self.calls = []
+    
+    async def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.return_value
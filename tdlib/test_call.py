@@ -5,8 +5,10 @@ Tests for call handling
 import pytest
 import asyncio
 from datetime import datetime
-from unittest.mock import Mock, patch, AsyncMock
-from src.core.call_manager import CallManager, CallSession
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+from stubs import AsyncStub
+from src.core.call_manager import CallManager, CallSession, PENDING, ACTIVE, ENDED
 
 class TestCallManager:
     """Test call management functionality"""
@@ -15,8 +17,8 @@ class TestCallManager:
     def tdlib_client(self):
         """Mock TDLib client"""
         client = Mock()
-        client.accept_call = AsyncMock()
-        client.end_call = AsyncMock()
+        client.accept_call = AsyncStub()
+        client.end_call = AsyncStub()
         client.register_handler = Mock()
         return client
     
@@ -24,15 +26,17 @@ class TestCallManager:
     def ai_components(self):
         """Mock AI components"""
         return {
-            'stt': Mock(transcribe=AsyncMock(return_value="Hello")),
-            'tts': Mock(synthesize=AsyncMock(return_value=b"audio")),
-            'llm': Mock(generate_response=AsyncMock(return_value="Hi there"))
+            'stt': SimpleNamespace(transcribe=AsyncStub(return_value="Hello")),
+            'tts': SimpleNamespace(synthesize=AsyncStub(return_value=b"audio")),
+            'llm': SimpleNamespace(generate_response=AsyncStub(return_value="Hi there"))
         }
     
     @pytest.fixture
     def manager(self, tdlib_client, ai_components):
         """Create call manager instance"""
-        return CallManager(tdlib_client, ai_components)
+        manager = CallManager(tdlib_client, ai_components)
+        manager.config['auto_answer_delay'] = 0
+        return manager
     
     @pytest.mark.asyncio
     async def test_incoming_call_auto_answer(self, manager, tdlib_client):
@@ -44,13 +48,29 @@ class TestCallManager:
         
         manager.config['auto_answer'] = True
         await manager.on_incoming_call(call)
+        await asyncio.gather(*manager.active_calls[123].tasks)
         
-        # Wait for auto-answer delay
-        await asyncio.sleep(2.1)
-        
-        tdlib_client.accept_call.assert_called_once_with(123)
+        assert tdlib_client.accept_call.calls == [((123,), {})]
         assert 123 in manager.active_calls
     
+    @pytest.mark.asyncio
+    async def test_hangup_cancels_auto_answer(self, manager, tdlib_client):
+        """Test that a call ended before the delay is never accepted"""
+        call = {
+            'id': 123,
+            'user_id': 456
+        }
+        
+        manager.config['auto_answer'] = True
+        manager.config['auto_answer_delay'] = 10
+        await manager.on_incoming_call(call)
+        timer = manager.active_calls[123].tasks[0]
+        await manager.on_call_ended(call)
+        
+        with pytest.raises(asyncio.CancelledError):
+            await timer
+        assert tdlib_client.accept_call.calls == []
+    
     @pytest.mark.asyncio
     async def test_call_ready_starts_processing(self, manager):
         """Test that call ready starts processing"""
@@ -63,7 +83,7 @@ class TestCallManager:
         
         assert 123 in manager.active_calls
         session = manager.active_calls[123]
-        assert session.state == 'active'
+        assert session.state == ACTIVE
         assert len(session.tasks) > 0
     
     @pytest.mark.asyncio
@@ -85,7 +105,7 @@ class TestCallManager:
         
         await manager.send_voice_response(call_id, text)
         
-        ai_components['tts'].synthesize.assert_called_once_with(text)
+        assert ai_components['tts'].synthesize.calls == [((text,), {})]
 
 class TestCallSession:
     """Test call session functionality"""
@@ -96,20 +116,20 @@ class TestCallSession:
         
         assert session.call_id == 123
         assert session.user_id == 456
-        assert session.state == 'pending'
-        assert isinstance(session.start_time, datetime)
+        assert session.state == PENDING
+        assert isinstance(session.start_time_ns, int)
         assert len(session.conversation_history) == 0
     
     def test_session_state_tracking(self):
         """Test session state changes"""
         session = CallSession(123)
         
-        assert session.state == 'pending'
+        assert session.state == PENDING
         
-        session.state = 'active'
+        session.state = ACTIVE
         session.connected_time = datetime.utcnow()
-        assert session.state == 'active'
+        assert session.state == ACTIVE
         
-        session.state = 'ended'
+        session.state = ENDED
         session.end_time = datetime.utcnow()
-        assert session.state == 'ended'
\ No newline at end of file
+        assert session.state == ENDED
\ No newline at end of file
@@ -4,6 +4,7 @@ Tests for TDLib client
 
 import pytest
 import asyncio
+import json
 import os
 from unittest.mock import Mock, patch, MagicMock
 from src.core.tdlib_client import TDLibClient
@@ -20,7 +21,7 @@ class TestTDLibClient:
     
     @pytest.fixture
     def client(self, mock_env):
-        """Create TDLib client instance"""
+        """Create a fresh TDLib client instance for each test"""
         with patch('src.core.tdlib_client.CDLL'):
             client = TDLibClient()
             client.tdjson = MagicMock()
@@ -55,13 +56,33 @@ class TestTDLibClient:
         """Test accepting a call"""
         call_id = 123
         
-        with patch.object(client, '_send') as mock_send:
+        with patch.object(client, '_send_raw') as mock_send:
             await client.accept_call(call_id)
             
         mock_send.assert_called_once()
-        call_args = mock_send.call_args[0][0]
-        assert call_args['@type'] == 'acceptCall'
-        assert call_args['call_id'] == call_id
+        assert json.loads(mock_send.call_args[0][0]) == {
+            '@type': 'acceptCall',
+            'call_id': call_id,
+            'protocol': {
+                '@type': 'callProtocol',
+                'udp_p2p': True,
+                'udp_reflector': True,
+                'min_layer': 65,
+                'max_layer': 92
+            }
+        }
+    
+    @pytest.mark.asyncio
+    async def test_close_skips_destroy_while_reader_alive(self, client):
+        """Test that a receiver stuck in TDLib keeps the client alive"""
+        client.client = Mock()
+        client._reader_thread = Mock()
+        client._reader_thread.is_alive.return_value = True
+        
+        await client.close()
+        
+        client._reader_thread.join.assert_called_once_with(15)
+        client.tdjson.td_json_client_destroy.assert_not_called()
     
     def test_register_handler(self, client):
         """Test handler registration"""
@@ -0,0 +1,35 @@
+"""
+Shared TDLib library lookup for the standalone scripts
+"""
+
+import os
+import sys
+from functools import lru_cache
+
+# Library file name for this platform, picked once at import
+if sys.platform == 'darwin':
+    TDLIB_NAME = 'libtdjson.dylib'
+elif sys.platform == 'win32':
+    TDLIB_NAME = 'tdjson.dll'
+else:
+    TDLIB_NAME = 'libtdjson.so'
+
+TDLIB_DIRS = (
+    './tdlib/lib',
+    './tdlib/build',
+    '/usr/local/lib'
+)
+
+TDLIB_PATHS = tuple(f'{base}/{TDLIB_NAME}' for base in TDLIB_DIRS)
+
+@lru_cache(maxsize=None)
+def find_tdlib():
+    """Find TDLib library (resolved once per process)"""
+    # An explicit TDJSON_PATH is trusted as-is, skipping the probes
+    env_path = os.getenv('TDJSON_PATH')
+    if env_path:
+        return env_path
+    for p in TDLIB_PATHS:
+        if os.path.exists(p):
+            return p
+    raise FileNotFoundError(f"TDLib library not found. Tried: {TDLIB_PATHS}")
@@ -4,26 +4,20 @@ Simple authentication test
 """
 
 import asyncio
-import json
+import orjson
 import os
-from pathlib import Path
+import threading
+from collections import deque
 from dotenv import load_dotenv
 from ctypes import CDLL, c_void_p, c_char_p, c_double
+from tdlib_path import find_tdlib
 
-load_dotenv()
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
-def find_tdlib():
-    """Find TDLib library"""
-    paths = [
-        './tdlib/lib/libtdjson.dylib',
-        './tdlib/build/libtdjson.dylib',
-        './tdlib/lib/libtdjson.so',
-        './tdlib/build/libtdjson.so'
-    ]
-    for p in paths:
-        if Path(p).exists():
-            return p
-    raise FileNotFoundError("TDLib not found")
+load_dotenv()
 
 async def test_auth():
     """Test authentication flow"""
@@ -34,6 +28,11 @@ async def test_auth():
     tdlib.td_json_client_send.argtypes = [c_void_p, c_char_p]
     tdlib.td_json_client_receive.restype = c_char_p
     tdlib.td_json_client_receive.argtypes = [c_void_p, c_double]
+    tdlib.td_json_client_destroy.argtypes = [c_void_p]
+    
+    # Timeout arguments are built once and reused on every receive
+    block_timeout = c_double(10.0)
+    poll_timeout = c_double(0.0)
     
     # Create client
     client = tdlib.td_json_client_create()
@@ -45,26 +44,72 @@ async def test_auth():
     
     print(f"Testing with phone: {phone[:3]}***{phone[-4:]}")
     
+    # Resolve the foreign functions once instead of per call
+    td_send = tdlib.td_json_client_send
+    td_receive = tdlib.td_json_client_receive
+    
     # Send function
     def send(query):
-        query_str = json.dumps(query).encode('utf-8')
-        tdlib.td_json_client_send(client, query_str)
+        query_str = orjson.dumps(query)
+        td_send(client, query_str)
+    
+    # Receive functions: block for the next update, or poll what is queued
+    def receive_block():
+        result = td_receive(client, block_timeout)
+        if result:
+            return orjson.loads(result)
+        return None
     
-    # Receive function
-    def receive(timeout=1.0):
-        result = tdlib.td_json_client_receive(client, c_double(timeout))
+    def receive_poll():
+        result = td_receive(client, poll_timeout)
         if result:
-            return json.loads(result.decode('utf-8'))
+            return orjson.loads(result)
         return None
     
-    # Authentication flow
-    auth_state = None
-    code_sent = False
+    # Receiver thread: blocks inside TDLib and wakes the event loop through
+    # a self-pipe, so the coroutine only runs when an update has arrived
+    loop = asyncio.get_running_loop()
+    updates = deque()
+    ready = asyncio.Event()
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    running = True
     
-    while True:
-        update = receive(1.0)
+    def reader():
+        while running:
+            # Park on one blocking receive, then drain whatever else is
+            # already queued without blocking and wake the loop once
+            batch = []
+            update = receive_block()
+            while update:
+                batch.append(update)
+                update = receive_poll()
+            if batch:
+                updates.extend(batch)
+                os.write(wake_w, b'x')
+    
+    def on_wake():
+        os.read(wake_r, 4096)
+        ready.set()
+    
+    async def next_update():
+        while not updates:
+            ready.clear()
+            await ready.wait()
+        return updates.popleft()
+    
+    loop.add_reader(wake_r, on_wake)
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    
+    try:
+        # Authentication flow
+        auth_state = None
+        code_sent = False
         
-        if update:
+        while True:
+            update = await next_update()
+            
             update_type = update.get('@type')
             
             if update_type == 'updateAuthorizationState':
@@ -119,7 +164,7 @@ async def test_auth():
                     print("\n" + "="*50)
                     print("📲 CHECK YOUR TELEGRAM APP FOR THE CODE")
                     print("="*50)
-                    code = input("Enter verification code: ").strip()
+                    code = (await asyncio.to_thread(input, "Enter verification code: ")).strip()
                     
                     send({
                         '@type': 'checkAuthenticationCode',
@@ -130,7 +175,7 @@ async def test_auth():
                 elif auth_state == 'authorizationStateWaitPassword':
                     # Request 2FA password
                     import getpass
-                    password = getpass.getpass("Enter 2FA password: ")
+                    password = await asyncio.to_thread(getpass.getpass, "Enter 2FA password: ")
                     
                     send({
                         '@type': 'checkAuthenticationPassword',
@@ -143,12 +188,24 @@ async def test_auth():
                     
             elif update_type == 'error':
                 print(f"Error: {update.get('message')}")
-        
-        await asyncio.sleep(0.01)
+    finally:
+        # Stop the receiver before the client is destroyed
+        running = False
+        loop.remove_reader(wake_r)
+        send({'@type': 'close'})
+        reader_thread.join(timeout=15)
+        os.close(wake_r)
+        # A reader still inside td_json_client_receive may yet use the
+        # client and write to the pipe; leave both to process exit
+        if reader_thread.is_alive():
+            print("⚠️ Receiver did not stop; leaving the client undestroyed")
+        else:
+            tdlib.td_json_client_destroy(client)
+            os.close(wake_w)
     
-    # Cleanup
-    send({'@type': 'close'})
     print("\nAuthentication test complete!")
 
 if __name__ == "__main__":
+    if uvloop:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(test_auth())
@@ -4,43 +4,28 @@ Test the assistant by sending it messages
 """
 
 import asyncio
-import json
 from datetime import datetime
-from ctypes import CDLL, c_void_p, c_char_p, c_double
-from pathlib import Path
+from tdclient import TDClient
 
-def find_tdlib():
-    paths = ['./tdlib/lib/libtdjson.dylib', './tdlib/build/libtdjson.dylib']
-    for p in paths:
-        if Path(p).exists():
-            return p
-    return None
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 async def send_test_message():
     """Send a test message to trigger response"""
     
-    tdlib_path = find_tdlib()
-    if not tdlib_path:
+    try:
+        td = TDClient()
+    except FileNotFoundError:
         print("TDLib not found")
         return
     
-    tdlib = CDLL(tdlib_path)
-    tdlib.td_json_client_create.restype = c_void_p
-    tdlib.td_json_client_send.argtypes = [c_void_p, c_char_p]
-    tdlib.td_json_client_receive.restype = c_char_p
-    tdlib.td_json_client_receive.argtypes = [c_void_p, c_double]
-    
-    client = tdlib.td_json_client_create()
-    
-    def send(data):
-        tdlib.td_json_client_send(client, json.dumps(data).encode('utf-8'))
-    
-    def receive(timeout=1.0):
-        result = tdlib.td_json_client_receive(client, c_double(timeout))
-        return json.loads(result.decode('utf-8')) if result else None
+    # Updates arrive through the client's reader thread; nothing polls
+    td.start()
     
     # Send a message to yourself
-    send({
+    td.send({
         '@type': 'sendMessage',
         'chat_id': 7112538016,  # Your chat ID from the logs
         'input_message_content': {
@@ -54,11 +39,19 @@ async def send_test_message():
     
     print("Test message sent!")
     
-    # Wait for response
-    for _ in range(10):
-        update = receive(1.0)
-        if update:
+    async def print_responses():
+        while True:
+            update = await td.get_update()
             print(f"Response: {update.get('@type')}")
-        await asyncio.sleep(0.1)
+    
+    # Print responses as they arrive for up to 10 seconds
+    try:
+        await asyncio.wait_for(print_responses(), 10)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await td.aclose()
 
+if uvloop:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 asyncio.run(send_test_message())
@@ -3,32 +3,82 @@
 
 import os
 import asyncio
+import hashlib
+from functools import lru_cache
+from pathlib import Path
 from gtts import gTTS
 import pygame
 from io import BytesIO
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Initialize pygame for audio playback
 pygame.mixer.init()
 
+# The event queue needs a video driver; a dummy one is enough headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame.display.init()
+
+# Post an event when music finishes instead of polling get_busy()
+MUSIC_END = pygame.USEREVENT + 1
+pygame.mixer.music.set_endevent(MUSIC_END)
+
+# How often the loop thread checks for the end-of-music event while a
+# clip is playing
+EVENT_POLL_INTERVAL = 0.05
+
+# Synthesized clips are kept on disk so repeated phrases skip the network
+TTS_CACHE_DIR = Path('./cache/tts')
+TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+@lru_cache(maxsize=128)
+def synthesize(text, lang='en', slow=False):
+    """Return MP3 bytes for text, from the disk cache when possible"""
+    key = hashlib.sha256(f"{lang}:{slow}:{text}".encode()).hexdigest()
+    path = TTS_CACHE_DIR / f'{key}.mp3'
+    if path.exists():
+        return path.read_bytes()
+    
+    tts = gTTS(text=text, lang=lang, slow=slow)
+    audio_buffer = BytesIO()
+    tts.write_to_fp(audio_buffer)
+    path.write_bytes(audio_buffer.getvalue())
+    return audio_buffer.getvalue()
+
+def watch_playback():
+    """Return an event that is set once the current clip finishes"""
+    loop = asyncio.get_running_loop()
+    # Created here, inside the running loop, as Python < 3.10 binds it
+    done = asyncio.Event()
+    
+    def pump():
+        # SDL only allows event handling on the thread that initialised
+        # video, which is the loop thread here
+        if pygame.event.get(MUSIC_END):
+            done.set()
+        else:
+            loop.call_later(EVENT_POLL_INTERVAL, pump)
+    
+    pump()
+    return done
+
 async def speak(text):
     """Convert text to speech and play it"""
     print(f"🔊 Speaking: {text}")
     
-    # Generate speech
-    tts = gTTS(text=text, lang='en', slow=False)
-    
-    # Save to memory
-    audio_buffer = BytesIO()
-    tts.write_to_fp(audio_buffer)
-    audio_buffer.seek(0)
+    # Generate speech off the loop; gTTS blocks on the network
+    audio_buffer = BytesIO(await asyncio.to_thread(synthesize, text))
     
     # Play audio
     pygame.mixer.music.load(audio_buffer)
     pygame.mixer.music.play()
+    playback_done = watch_playback()
     
     # Wait for audio to finish
-    while pygame.mixer.music.get_busy():
-        await asyncio.sleep(0.1)
+    await playback_done.wait()
 
 async def test():
     """Test TTS"""
@@ -37,4 +87,6 @@ async def test():
     await speak("Call me on Telegram to test!")
 
 if __name__ == '__main__':
+    if uvloop:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(test())
@@ -4,28 +4,131 @@ Working TDLib authentication with correct parameter structure
 """
 
 import asyncio
-import json
+import getpass
 import os
-from pathlib import Path
+import orjson
+import sys
+import threading
+from collections import deque
+from types import SimpleNamespace
 from dotenv import load_dotenv
 from ctypes import CDLL, c_void_p, c_char_p, c_double
+from tdlib_path import find_tdlib
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # Load environment
 load_dotenv()
 
-def find_tdlib():
-    """Find TDLib library"""
-    paths = [
-        './tdlib/lib/libtdjson.dylib',
-        './tdlib/build/libtdjson.dylib',
-        './tdlib/lib/libtdjson.so',
-        './tdlib/build/libtdjson.so'
-    ]
-    for p in paths:
-        if Path(p).exists():
-            print(f"Found TDLib at: {p}")
-            return p
-    raise FileNotFoundError("TDLib library not found")
+# Create data directories once, skipping mkdir when they already exist
+for data_dir in ('./data/tdlib/db', './data/tdlib/files'):
+    if not os.path.isdir(data_dir):
+        os.makedirs(data_dir, exist_ok=True)
+
+# Request payloads serialized once; only the placeholders are spliced per run
+_PARAMS_TEMPLATE = orjson.dumps({
+    '@type': 'setTdlibParameters',
+    'api_id': '__API_ID__',
+    'api_hash': '__API_HASH__',
+    'database_directory': './data/tdlib/db',
+    'files_directory': './data/tdlib/files',
+    'use_file_database': True,
+    'use_chat_info_database': True,
+    'use_message_database': True,
+    'use_secret_chats': False,
+    'system_language_code': 'en',
+    'device_model': 'Desktop',
+    'system_version': 'Unknown',
+    'application_version': '1.0.0',
+    'enable_storage_optimizer': True
+})
+
+_PHONE_TEMPLATE = orjson.dumps({
+    '@type': 'setAuthenticationPhoneNumber',
+    'phone_number': '__PHONE__',
+    'settings': {
+        '@type': 'phoneNumberAuthenticationSettings',
+        'allow_flash_call': False,
+        'allow_missed_call': False,
+        'is_current_phone_number': False,
+        'allow_sms_retriever_api': False,
+        'authentication_tokens': []
+    }
+})
+
+# Authorization state coroutines; each takes the per-run context and may
+# return _READY or _CLOSED to end the authentication loop
+_READY = sys.intern('authorizationStateReady')
+_CLOSED = sys.intern('authorizationStateClosed')
+
+async def _send_params(ctx):
+    """Send TDLib parameters - CRITICAL PART"""
+    ctx.send_raw(ctx.params_payload, 'setTdlibParameters')
+
+async def _send_phone(ctx):
+    """Send phone number"""
+    print(f"📱 Sending phone number: {ctx.phone}")
+    ctx.send_raw(ctx.phone_payload, 'setAuthenticationPhoneNumber')
+
+async def _ask_code(ctx):
+    """Request verification code"""
+    if ctx.code_requested:
+        return
+    print("\n" + "="*60)
+    print("📲 VERIFICATION REQUIRED")
+    print("="*60)
+    print("Check your Telegram app for a code from:")
+    print("  • Telegram official account")
+    print("  • SMS to your phone")
+    print("-"*60)
+    
+    # Prompt on a worker thread so the reader pipe keeps draining
+    code = (await asyncio.to_thread(input, "Enter verification code (5 digits): ")).strip()
+    
+    ctx.send({
+        '@type': 'checkAuthenticationCode',
+        'code': code
+    })
+    ctx.code_requested = True
+
+async def _ask_password(ctx):
+    """Request 2FA password"""
+    if ctx.password_requested:
+        return
+    print("\n🔐 2FA Password Required")
+    password = await asyncio.to_thread(getpass.getpass, "Enter password: ")
+    
+    ctx.send({
+        '@type': 'checkAuthenticationPassword',
+        'password': password
+    })
+    ctx.password_requested = True
+
+async def _on_ready(ctx):
+    """Announce successful login"""
+    print("\n" + "="*60)
+    print("✅ SUCCESSFULLY LOGGED IN!")
+    print("="*60)
+    print("\n📞 Ready to receive calls")
+    print("Press Ctrl+C to exit\n")
+    return _READY
+
+async def _on_closed(ctx):
+    """Announce closed session"""
+    print("Session closed")
+    return _CLOSED
+
+_STATE_HANDLERS = {
+    sys.intern('authorizationStateWaitTdlibParameters'): _send_params,
+    sys.intern('authorizationStateWaitPhoneNumber'): _send_phone,
+    sys.intern('authorizationStateWaitCode'): _ask_code,
+    sys.intern('authorizationStateWaitPassword'): _ask_password,
+    _READY: _on_ready,
+    _CLOSED: _on_closed,
+}
 
 async def main():
     """Main authentication flow"""
@@ -43,12 +146,9 @@ async def main():
     print(f"Phone: {phone[:6]}****")
     print("-"*60)
     
-    # Create data directories
-    Path('./data/tdlib/db').mkdir(parents=True, exist_ok=True)
-    Path('./data/tdlib/files').mkdir(parents=True, exist_ok=True)
-    
     # Load TDLib
     tdlib_path = find_tdlib()
+    print(f"Found TDLib at: {tdlib_path}")
     tdlib = CDLL(tdlib_path)
     
     # Setup functions
@@ -56,120 +156,118 @@ async def main():
     tdlib.td_json_client_send.argtypes = [c_void_p, c_char_p]
     tdlib.td_json_client_receive.restype = c_char_p
     tdlib.td_json_client_receive.argtypes = [c_void_p, c_double]
+    
+    # Timeout arguments are built once and reused on every receive
+    block_timeout = c_double(10.0)
+    poll_timeout = c_double(0.0)
     tdlib.td_json_client_destroy.argtypes = [c_void_p]
     
     # Create client
     client = tdlib.td_json_client_create()
     print("✅ TDLib client created")
     
+    # Resolve the foreign functions once instead of per call
+    td_send = tdlib.td_json_client_send
+    td_receive = tdlib.td_json_client_receive
+    
     def send(data):
         """Send request to TDLib"""
-        request = json.dumps(data)
+        request = orjson.dumps(data)
         print(f"→ Sending: {data.get('@type')}")
-        tdlib.td_json_client_send(client, request.encode('utf-8'))
+        td_send(client, request)
+    
+    def send_raw(payload, request_type):
+        """Send a pre-serialized request to TDLib"""
+        print(f"→ Sending: {request_type}")
+        td_send(client, payload)
+    
+    params_payload = (_PARAMS_TEMPLATE
+                      .replace(b'"__API_ID__"', str(api_id).encode())
+                      .replace(b'"__API_HASH__"', orjson.dumps(api_hash)))
+    phone_payload = _PHONE_TEMPLATE.replace(b'"__PHONE__"', orjson.dumps(phone))
     
-    def receive(timeout=2.0):
-        """Receive response from TDLib"""
-        result = tdlib.td_json_client_receive(client, c_double(timeout))
+    def receive_block():
+        """Wait up to 10 s for a response from TDLib"""
+        result = td_receive(client, block_timeout)
         if result:
-            return json.loads(result.decode('utf-8'))
+            return orjson.loads(result)
         return None
     
-    # State tracking
-    code_requested = False
-    password_requested = False
+    def receive_poll():
+        """Return an already queued response from TDLib, if any"""
+        result = td_receive(client, poll_timeout)
+        if result:
+            return orjson.loads(result)
+        return None
     
-    print("\n🔄 Starting authentication flow...")
-    print("-"*60)
+    # Receiver thread: blocks inside TDLib and wakes the event loop through
+    # a self-pipe, so the coroutine only runs when an update has arrived
+    loop = asyncio.get_running_loop()
+    updates = deque()
+    ready = asyncio.Event()
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    running = True
+    
+    def reader():
+        while running:
+            # Park on one blocking receive, then drain whatever else is
+            # already queued without blocking and wake the loop once
+            batch = []
+            update = receive_block()
+            while update:
+                batch.append(update)
+                update = receive_poll()
+            if batch:
+                updates.extend(batch)
+                os.write(wake_w, b'x')
+    
+    def on_wake():
+        os.read(wake_r, 4096)
+        ready.set()
+    
+    async def next_update():
+        while not updates:
+            ready.clear()
+            await ready.wait()
+        return updates.popleft()
     
-    while True:
-        # Receive update
-        update = receive(1.0)
+    loop.add_reader(wake_r, on_wake)
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    
+    # State shared with the authorization handlers
+    ctx = SimpleNamespace(
+        send=send,
+        send_raw=send_raw,
+        phone=phone,
+        params_payload=params_payload,
+        phone_payload=phone_payload,
+        code_requested=False,
+        password_requested=False
+    )
+    
+    try:
+        print("\n🔄 Starting authentication flow...")
+        print("-"*60)
         
-        if update:
+        while True:
+            # Receive update
+            update = await next_update()
+            
             update_type = update.get('@type', '')
             
             if update_type == 'updateAuthorizationState':
-                state = update['authorization_state']['@type']
+                state = sys.intern(update['authorization_state']['@type'])
                 print(f"📍 State: {state}")
                 
-                if state == 'authorizationStateWaitTdlibParameters':
-                    # Send TDLib parameters - CRITICAL PART
-                    params = {
-                        '@type': 'setTdlibParameters',
-                        'api_id': api_id,
-                        'api_hash': api_hash,
-                        'database_directory': './data/tdlib/db',
-                        'files_directory': './data/tdlib/files',
-                        'use_file_database': True,
-                        'use_chat_info_database': True,
-                        'use_message_database': True,
-                        'use_secret_chats': False,
-                        'system_language_code': 'en',
-                        'device_model': 'Desktop',
-                        'system_version': 'Unknown',
-                        'application_version': '1.0.0',
-                        'enable_storage_optimizer': True
-                    }
-                    send(params)
-                
-                elif state == 'authorizationStateWaitPhoneNumber':
-                    # Send phone number
-                    print(f"📱 Sending phone number: {phone}")
-                    send({
-                        '@type': 'setAuthenticationPhoneNumber',
-                        'phone_number': phone,
-                        'settings': {
-                            '@type': 'phoneNumberAuthenticationSettings',
-                            'allow_flash_call': False,
-                            'allow_missed_call': False,
-                            'is_current_phone_number': False,
-                            'allow_sms_retriever_api': False,
-                            'authentication_tokens': []
-                        }
-                    })
-                
-                elif state == 'authorizationStateWaitCode' and not code_requested:
-                    # Request verification code
-                    print("\n" + "="*60)
-                    print("📲 VERIFICATION REQUIRED")
-                    print("="*60)
-                    print("Check your Telegram app for a code from:")
-                    print("  • Telegram official account")
-                    print("  • SMS to your phone")
-                    print("-"*60)
-                    
-                    code = input("Enter verification code (5 digits): ").strip()
-                    
-                    send({
-                        '@type': 'checkAuthenticationCode',
-                        'code': code
-                    })
-                    code_requested = True
-                
-                elif state == 'authorizationStateWaitPassword' and not password_requested:
-                    # Request 2FA password
-                    print("\n🔐 2FA Password Required")
-                    import getpass
-                    password = getpass.getpass("Enter password: ")
-                    
-                    send({
-                        '@type': 'checkAuthenticationPassword',
-                        'password': password
-                    })
-                    password_requested = True
-                
-                elif state == 'authorizationStateReady':
-                    print("\n" + "="*60)
-                    print("✅ SUCCESSFULLY LOGGED IN!")
-                    print("="*60)
-                    print("\n📞 Ready to receive calls")
-                    print("Press Ctrl+C to exit\n")
-                    break
-                
-                elif state == 'authorizationStateClosed':
-                    print("Session closed")
-                    return
+                handler = _STATE_HANDLERS.get(state)
+                if handler:
+                    outcome = await handler(ctx)
+                    if outcome is _READY:
+                        break
+                    if outcome is _CLOSED:
+                        return
             
             elif update_type == 'error':
                 print(f"❌ Error: {update['message']}")
@@ -185,22 +283,32 @@ async def main():
                 print(f"\n📞 CALL UPDATE: {call['state']['@type']}")
                 if call['state']['@type'] == 'callStatePending':
                     print(f"   From user: {call.get('user_id')}")
-    
-    # Keep running to monitor for calls
-    try:
-        while True:
-            update = receive(1.0)
-            if update:
+        
+        # Keep running to monitor for calls
+        try:
+            while True:
+                update = await next_update()
                 if update.get('@type') == 'updateCall':
                     print(f"📞 Call event: {update}")
-            await asyncio.sleep(0.1)
-    except KeyboardInterrupt:
-        print("\n👋 Shutting down...")
-    
-    # Cleanup
-    send({'@type': 'close'})
-    tdlib.td_json_client_destroy(client)
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("\n👋 Shutting down...")
+    finally:
+        # Cleanup: stop the receiver before the client is destroyed
+        running = False
+        loop.remove_reader(wake_r)
+        send({'@type': 'close'})
+        reader_thread.join(timeout=15)
+        os.close(wake_r)
+        # A reader still inside td_json_client_receive may yet use the
+        # client and write to the pipe; leave both to process exit
+        if reader_thread.is_alive():
+            print("⚠️ Receiver did not stop; leaving the client undestroyed")
+        else:
+            tdlib.td_json_client_destroy(client)
+            os.close(wake_w)
     print("✅ Clean shutdown complete")
 
 if __name__ == '__main__':
+    if uvloop:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
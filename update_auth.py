@@ -1,29 +1,76 @@
-import fileinput
-import sys
+import libcst as cst
+import libcst.matchers as m
 
 # This script updates the tdlib_client.py to use better auth handling
 print("Updating authentication handling...")
 
+TARGET = 'src/core/tdlib_client.py'
+
+DOTENV_IMPORT = m.SimpleStatementLine(body=[m.ImportFrom(module=m.Name('dotenv'))])
+AUTH_IMPORT = m.SimpleStatementLine(body=[m.ImportFrom(
+    module=m.Name('auth_handler'),
+    names=[m.ImportAlias(name=m.Name('AuthHandler'))]
+)])
+RUNNING_ASSIGN = m.SimpleStatementLine(body=[m.Assign(
+    targets=[m.AssignTarget(target=m.Attribute(value=m.Name('self'), attr=m.Name('_running')))]
+)])
+AUTH_ASSIGN = m.SimpleStatementLine(body=[m.Assign(
+    targets=[m.AssignTarget(target=m.Attribute(value=m.Name('self'), attr=m.Name('auth_handler')))]
+)])
+
+
+def insert_after(statements, anchor, new_statement):
+    """Insert new_statement after the first statement matching anchor"""
+    for i, statement in enumerate(statements):
+        if m.matches(statement, anchor):
+            return [*statements[:i + 1], new_statement, *statements[i + 1:]]
+    return statements
+
+
+class AuthHandlerInjector(cst.CSTTransformer):
+    """Add the AuthHandler import and its __init__ assignment, once"""
+
+    def __init__(self):
+        super().__init__()
+        self.classes = []
+
+    def visit_ClassDef(self, node):
+        self.classes.append(node.name.value)
+
+    def leave_ClassDef(self, original_node, updated_node):
+        self.classes.pop()
+        return updated_node
+
+    def leave_Module(self, original_node, updated_node):
+        if any(m.matches(s, AUTH_IMPORT) for s in updated_node.body):
+            return updated_node
+        statement = cst.parse_statement('from .auth_handler import AuthHandler\n')
+        return updated_node.with_changes(
+            body=insert_after(updated_node.body, DOTENV_IMPORT, statement)
+        )
+
+    def leave_FunctionDef(self, original_node, updated_node):
+        if updated_node.name.value != '__init__' or self.classes[-1:] != ['TDLibClient']:
+            return updated_node
+        body = updated_node.body.body
+        if any(m.matches(s, AUTH_ASSIGN) for s in body):
+            return updated_node
+        statement = cst.parse_statement('self.auth_handler = AuthHandler()\n')
+        return updated_node.with_changes(
+            body=updated_node.body.with_changes(body=insert_after(body, RUNNING_ASSIGN, statement))
+        )
+
+
 # Read the current file
-with open('src/core/tdlib_client.py', 'r') as f:
+with open(TARGET, 'r') as f:
     content = f.read()
 
-# Check if auth_handler import is already there
-if 'from .auth_handler import AuthHandler' not in content:
-    # Add import after other imports
-    content = content.replace(
-        'from dotenv import load_dotenv',
-        'from dotenv import load_dotenv\nfrom .auth_handler import AuthHandler'
-    )
-    
-    # Add auth_handler initialization
-    content = content.replace(
-        'self._running = False',
-        'self._running = False\n        self.auth_handler = AuthHandler()'
-    )
-
-# Write back
-with open('src/core/tdlib_client.py', 'w') as f:
-    f.write(content)
-
-print("✅ Updated authentication handling")
+module = cst.parse_module(content).visit(AuthHandlerInjector())
+
+# Write back only if something changed
+if module.code != content:
+    with open(TARGET, 'w') as f:
+        f.write(module.code)
+    print("✅ Updated authentication handling")
+else:
+    print("✅ Authentication handling already up to date")
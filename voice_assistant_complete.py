@@ -4,19 +4,68 @@ Complete Telegram Voice Assistant - Ready for calls
 """
 
 import asyncio
-import json
+import orjson
 import os
 import sys
+import time
+import traceback
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
-from ctypes import CDLL, c_void_p, c_char_p, c_double
+from tdclient import TDClient
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # Add project to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 load_dotenv()
 
+# acceptCall serialized once; only the call id is spliced per use
+_ACCEPT_PREFIX, _ACCEPT_SUFFIX = orjson.dumps({
+    '@type': 'acceptCall',
+    'call_id': '__CALL_ID__',
+    'protocol': {
+        '@type': 'callProtocol',
+        'udp_p2p': True,
+        'udp_reflector': True,
+        'min_layer': 65,
+        'max_layer': 92,
+        'library_versions': ['1.0.0']
+    }
+}).split(b'"__CALL_ID__"')
+
+# Updates that arrive constantly and are never worth reporting
+_NOISY_UPDATES = frozenset({
+    'updateOption',
+    'updateAuthorizationState',
+    'updateConnectionState',
+    'updateUserStatus',
+    'updateFile',
+    'updateChatReadInbox'
+})
+
+# Last formatted timestamp; reformatted only when the second changes
+_ts_second = 0
+_ts_text = ''
+
+def _timestamp():
+    """Return the local time as HH:MM:SS, formatting at most once a second"""
+    global _ts_second, _ts_text
+    now = int(time.time())
+    if now != _ts_second:
+        _ts_second = now
+        _ts_text = time.strftime('%H:%M:%S', time.localtime(now))
+    return _ts_text
+
+def _write(*lines):
+    """Write a block of lines to stdout in a single call"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
 class VoiceAssistant:
     """Telegram Voice Assistant with full authentication"""
     
@@ -25,258 +74,175 @@ class VoiceAssistant:
         self.api_id = int(os.getenv('TELEGRAM_API_ID'))
         self.api_hash = os.getenv('TELEGRAM_API_HASH')
         self.phone = os.getenv('TELEGRAM_PHONE_NUMBER')
+        # Seconds to wait before picking up; 0 answers immediately
+        self.answer_delay = float(os.getenv('AUTO_ANSWER_DELAY', '2.0'))
         
         # Create data directories
         Path('./data/tdlib/db').mkdir(parents=True, exist_ok=True)
         Path('./data/tdlib/files').mkdir(parents=True, exist_ok=True)
         
-        # Find and load TDLib
-        self.tdlib_path = self._find_tdlib()
-        self.tdlib = CDLL(self.tdlib_path)
-        self._setup_tdlib()
+        # Find and load TDLib (one client per process)
+        self.td = TDClient.shared()
         
-        self.client = None
         self.running = True
         self.authenticated = False
-        self.code_requested = False
+        self.call_count = 0
+        self.message_count = 0
+        self._pending = {}
+        
+        # Update dispatch; None marks updates that are deliberately ignored
+        self._handlers = dict.fromkeys(_NOISY_UPDATES)
+        self._handlers['updateCall'] = self._on_call
+        self._handlers['updateNewMessage'] = self._on_message
+        self._call_state_handlers = {
+            'callStatePending': self._on_call_pending,
+            'callStateReady': self._on_call_ready,
+            'callStateDiscarded': self._on_call_discarded
+        }
         
-    def _find_tdlib(self):
-        """Find TDLib library"""
-        paths = [
-            './tdlib/lib/libtdjson.dylib',
-            './tdlib/build/libtdjson.dylib',
-            './tdlib/lib/libtdjson.so',
-            './tdlib/build/libtdjson.so'
-        ]
-        for p in paths:
-            if Path(p).exists():
-                return p
-        raise FileNotFoundError("TDLib not found")
-    
-    def _setup_tdlib(self):
-        """Setup TDLib functions"""
-        self.tdlib.td_json_client_create.restype = c_void_p
-        self.tdlib.td_json_client_send.argtypes = [c_void_p, c_char_p]
-        self.tdlib.td_json_client_receive.restype = c_char_p
-        self.tdlib.td_json_client_receive.argtypes = [c_void_p, c_double]
-        self.tdlib.td_json_client_destroy.argtypes = [c_void_p]
-    
-    def send(self, data):
-        """Send request to TDLib"""
-        request = json.dumps(data)
-        self.tdlib.td_json_client_send(self.client, request.encode('utf-8'))
-    
-    def receive(self, timeout=1.0):
-        """Receive response from TDLib"""
-        result = self.tdlib.td_json_client_receive(self.client, c_double(timeout))
-        if result:
-            return json.loads(result.decode('utf-8'))
-        return None
-    
     async def authenticate(self):
         """Handle authentication flow"""
-        while not self.authenticated:
-            update = self.receive(0.5)
-            
-            if update:
-                update_type = update.get('@type', '')
-                
-                if update_type == 'updateAuthorizationState':
-                    state = update['authorization_state']['@type']
-                    
-                    if state == 'authorizationStateWaitTdlibParameters':
-                        # Send parameters
-                        params = {
-                            '@type': 'setTdlibParameters',
-                            'api_id': self.api_id,
-                            'api_hash': self.api_hash,
-                            'database_directory': './data/tdlib/db',
-                            'files_directory': './data/tdlib/files',
-                            'use_file_database': True,
-                            'use_chat_info_database': True,
-                            'use_message_database': True,
-                            'use_secret_chats': False,
-                            'system_language_code': 'en',
-                            'device_model': 'Desktop',
-                            'system_version': 'Unknown',
-                            'application_version': '1.0.0',
-                            'enable_storage_optimizer': True
-                        }
-                        self.send(params)
-                        print("📤 Sent TDLib parameters")
-                    
-                    elif state == 'authorizationStateWaitPhoneNumber':
-                        # Send phone
-                        self.send({
-                            '@type': 'setAuthenticationPhoneNumber',
-                            'phone_number': self.phone,
-                            'settings': {
-                                '@type': 'phoneNumberAuthenticationSettings',
-                                'allow_flash_call': False,
-                                'allow_missed_call': False,
-                                'is_current_phone_number': False,
-                                'allow_sms_retriever_api': False,
-                                'authentication_tokens': []
-                            }
-                        })
-                        print(f"📱 Sent phone number: {self.phone[:6]}****")
-                    
-                    elif state == 'authorizationStateWaitCode' and not self.code_requested:
-                        print("\n" + "="*60)
-                        print("📲 VERIFICATION CODE REQUIRED")
-                        print("Check your Telegram app")
-                        print("="*60)
-                        code = input("Enter code: ").strip()
-                        
-                        self.send({
-                            '@type': 'checkAuthenticationCode',
-                            'code': code
-                        })
-                        self.code_requested = True
-                    
-                    elif state == 'authorizationStateWaitPassword':
-                        import getpass
-                        password = getpass.getpass("🔐 Enter 2FA password: ")
-                        
-                        self.send({
-                            '@type': 'checkAuthenticationPassword',
-                            'password': password
-                        })
-                    
-                    elif state == 'authorizationStateReady':
-                        self.authenticated = True
-                        print("\n✅ AUTHENTICATED SUCCESSFULLY!")
-                        return True
-                
-                elif update_type == 'error':
-                    print(f"⚠️ Error: {update.get('message')}")
-            
-            await asyncio.sleep(0.01)
+        await self.td.authenticate(self.api_id, self.api_hash, self.phone)
+        self.authenticated = True
+        print("\n✅ AUTHENTICATED SUCCESSFULLY!")
+        return True
     
     async def handle_call(self, call):
         """Handle incoming/outgoing calls"""
+        # Unpack the state once; it is reused by the state handlers
+        state = call['state']
+        handler = self._call_state_handlers.get(state['@type'])
+        if handler:
+            handler(call, state, _timestamp())
+    
+    def _on_call_pending(self, call, state, timestamp):
+        """Announce an incoming call and schedule the auto-answer"""
+        if call.get('is_outgoing', False):
+            return
         call_id = call['id']
-        state = call['state']['@type']
-        is_outgoing = call.get('is_outgoing', False)
-        user_id = call.get('user_id')
-        
-        timestamp = datetime.now().strftime('%H:%M:%S')
+        _write(
+            f"\n{'='*60}",
+            f"📞 INCOMING CALL at {timestamp}",
+            f"{'='*60}",
+            f"From User ID: {call.get('user_id')}",
+            f"Call ID: {call_id}",
+            f"🔔 Auto-answering in {self.answer_delay:g} seconds..."
+        )
         
-        if state == 'callStatePending' and not is_outgoing:
-            print(f"\n{'='*60}")
-            print(f"📞 INCOMING CALL at {timestamp}")
-            print(f"{'='*60}")
-            print(f"From User ID: {user_id}")
-            print(f"Call ID: {call_id}")
-            print("🔔 Auto-answering in 2 seconds...")
-            
-            await asyncio.sleep(2)
-            
-            # Accept call
-            self.send({
-                '@type': 'acceptCall',
-                'call_id': call_id,
-                'protocol': {
-                    '@type': 'callProtocol',
-                    'udp_p2p': True,
-                    'udp_reflector': True,
-                    'min_layer': 65,
-                    'max_layer': 92,
-                    'library_versions': ['1.0.0']
-                }
-            })
-            print("✅ Call accepted!")
-            
-        elif state == 'callStateReady':
-            print(f"\n🎙️ CALL CONNECTED at {timestamp}")
-            print("📢 Voice channel is open")
-            print("🤖 [AI Assistant would speak here]")
-            
-            # Simulate AI greeting
-            greeting = "Hello! This is your AI assistant. How can I help you today?"
-            print(f"🗣️ AI says: '{greeting}'")
-            
-        elif state == 'callStateDiscarded':
-            reason = call['state'].get('reason', {}).get('@type', 'unknown')
-            duration = call['state'].get('duration', 0)
-            print(f"\n📵 CALL ENDED at {timestamp}")
-            print(f"Duration: {duration} seconds")
-            print(f"Reason: {reason}")
-            print(f"{'='*60}\n")
+        # Accept in the background so a hangup can cancel it
+        self._pending[call_id] = asyncio.create_task(self._delayed_accept(call_id))
+    
+    def _on_call_ready(self, call, state, timestamp):
+        """Announce a connected call"""
+        # Simulate AI greeting
+        greeting = "Hello! This is your AI assistant. How can I help you today?"
+        _write(
+            f"\n🎙️ CALL CONNECTED at {timestamp}",
+            "📢 Voice channel is open",
+            "🤖 [AI Assistant would speak here]",
+            f"🗣️ AI says: '{greeting}'"
+        )
+    
+    def _on_call_discarded(self, call, state, timestamp):
+        """Cancel a pending auto-answer and report the ended call"""
+        pending = self._pending.pop(call['id'], None)
+        if pending:
+            pending.cancel()
+        try:
+            reason = state['reason']['@type']
+        except KeyError:
+            reason = 'unknown'
+        _write(
+            f"\n📵 CALL ENDED at {timestamp}",
+            f"Duration: {state.get('duration', 0)} seconds",
+            f"Reason: {reason}",
+            f"{'='*60}\n"
+        )
+    
+    async def _delayed_accept(self, call_id):
+        """Accept a call after the auto-answer delay"""
+        if self.answer_delay:
+            await asyncio.sleep(self.answer_delay)
+        self._pending.pop(call_id, None)
+        self.td.send_raw(_ACCEPT_PREFIX + b'%d' % call_id + _ACCEPT_SUFFIX)
+        print("✅ Call accepted!")
+    
+    async def _on_call(self, update):
+        """Dispatch a call update"""
+        self.call_count += 1
+        print(f"\n🔔 Call Event #{self.call_count}")
+        await self.handle_call(update['call'])
+    
+    async def _on_message(self, update):
+        """Log incoming text messages"""
+        self.message_count += 1
+        content = update['message'].get('content', {})
+        if content.get('@type') == 'messageText':
+            text = content.get('text', {}).get('text', '')
+            if text:
+                print(f"💬 Message #{self.message_count}: {text[:50]}...")
+    
+    async def _on_other(self, update):
+        """Log other updates for debugging"""
+        update_type = update.get('@type', '')
+        # Every TDLib update type starts with 'update'
+        if update_type.startswith('update'):
+            print(f"📡 {update_type}")
     
     async def run(self):
         """Main run loop"""
-        print("\n" + "="*60)
-        print("🤖 TELEGRAM VOICE ASSISTANT")
-        print("="*60)
-        print(f"Phone: {self.phone}")
-        print("Status: INITIALIZING...")
-        print("="*60)
+        _write(
+            "\n" + "="*60,
+            "🤖 TELEGRAM VOICE ASSISTANT",
+            "="*60,
+            f"Phone: {self.phone}",
+            "Status: INITIALIZING...",
+            "="*60
+        )
+        
+        # TDLib version is a synchronous option; no round-trip needed
+        version = self.td.execute({'@type': 'getOption', 'name': 'version'})
+        if version and 'value' in version:
+            print(f"TDLib version: {version['value']}")
         
-        # Create client
-        self.client = self.tdlib.td_json_client_create()
+        # Create client and start receiving updates
+        self.td.start()
         
         # Authenticate if needed
         print("\n🔐 Checking authentication status...")
         await self.authenticate()
         
-        print("\n" + "="*60)
-        print("📞 VOICE ASSISTANT ACTIVE")
-        print("="*60)
-        print("✅ Ready to receive calls")
-        print("✅ Auto-answer enabled")
-        print("✅ AI responses ready")
-        print("\nℹ️ Call " + self.phone + " from another account to test")
-        print("Press Ctrl+C to stop")
-        print("="*60 + "\n")
+        # Ignored updates no longer need decoding once logged in
+        self.td.skip_updates(_NOISY_UPDATES)
+        
+        _write(
+            "\n" + "="*60,
+            "📞 VOICE ASSISTANT ACTIVE",
+            "="*60,
+            "✅ Ready to receive calls",
+            "✅ Auto-answer enabled",
+            "✅ AI responses ready",
+            "\nℹ️ Call " + self.phone + " from another account to test",
+            "Press Ctrl+C to stop",
+            "="*60 + "\n"
+        )
         
         # Monitor for updates
         try:
-            call_count = 0
-            message_count = 0
-            
             while self.running:
-                update = self.receive(0.5)
-                
-                if update:
-                    update_type = update.get('@type', '')
-                    
-                    if update_type == 'updateCall':
-                        call_count += 1
-                        print(f"\n🔔 Call Event #{call_count}")
-                        await self.handle_call(update['call'])
-                    
-                    elif update_type == 'updateNewMessage':
-                        message_count += 1
-                        message = update['message']
-                        if message.get('content', {}).get('@type') == 'messageText':
-                            text = message['content'].get('text', {}).get('text', '')
-                            if text:
-                                print(f"💬 Message #{message_count}: {text[:50]}...")
-                    
-                    elif update_type == 'updateUserStatus':
-                        # User status updates (online/offline)
-                        pass
-                    
-                    elif update_type == 'updateOption':
-                        # Option updates
-                        pass
-                    
-                    elif update_type != 'updateAuthorizationState':
-                        # Log other updates for debugging
-                        if 'update' in update_type.lower():
-                            print(f"📡 {update_type}")
+                update = await self.td.get_update()
                 
-                await asyncio.sleep(0.01)
+                update_type = update.get('@type', '')
+                handler = self._handlers.get(update_type, self._on_other)
+                if handler:
+                    await handler(update)
                 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\n\n⚠️ Stopping assistant...")
         finally:
             self.running = False
             print("🔄 Closing connection...")
-            self.send({'@type': 'close'})
-            await asyncio.sleep(1)
-            self.tdlib.td_json_client_destroy(self.client)
+            await self.td.aclose()
             print("✅ Shutdown complete")
             print("👋 Goodbye!")
 
@@ -287,11 +253,13 @@ async def main():
         await assistant.run()
     except Exception as e:
         print(f"\n❌ Error: {e}")
-        import traceback
         traceback.print_exc()
 
 if __name__ == '__main__':
     print("Starting Telegram Voice Assistant...")
     print("Current time:", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     print("-" * 60)
+    # Policy hook rather than asyncio.Runner, which needs Python 3.11
+    if uvloop:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())